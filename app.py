@@ -1,19 +1,33 @@
-from flask import Flask, request, jsonify, render_template, send_file
-from io import BytesIO
-import requests
+from flask import Flask, Response, request, jsonify, render_template, send_file, stream_with_context
 from bs4 import BeautifulSoup
 import openai
 import os
 from dotenv import load_dotenv
+# Before the local modules below, which read their settings at import time
+load_dotenv()
 import re
 import logging
 import json
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from functools import lru_cache
-from time import time
+import threading
+import socket
+import contextvars
+from concurrent.futures import FIRST_COMPLETED, wait
+from contextlib import nullcontext
+from functools import partial
+from time import sleep, time
 from urllib.parse import urlparse
-
-load_dotenv()
+import click
+import requests
+import io_executor
+import metrics
+from article_store import ArticleStore
+from crawler import Crawler
+from extract import extract_article
+from image_cache import ImageCache, ImageTooLarge
+from llm import LLM_MODEL, get_client
+from llm_cache import ResponseCache, cache_key
+from search_index import SearchIndex
+from singleflight import SingleFlight
 
 app = Flask(__name__)
 openai.api_key = os.getenv('OPENAI_API_KEY')
@@ -25,203 +39,633 @@ logger = logging.getLogger(__name__)
 def index():
     return render_template('index.html')
 
+def wants_timings():
+    return request.values.get('timings', '').lower() in ('1', 'true', 'yes')
+
+def track_timings():
+    # Per-request breakdowns are opt-in so normal searches don't pay for them
+    return metrics.track_request() if wants_timings() else nullcontext()
+
+def normalize_keyword(keyword):
+    # The index is case-folded, so "Music", "music " and "MUSIC" are one search:
+    # one in-flight search, one set of LLM cache entries and one prompt
+    return ' '.join(keyword.split()).casefold()
+
 @app.route('/search', methods=['POST'])
 def search():
-    keyword = request.form['keyword']
+    keyword = normalize_keyword(request.form['keyword'])
     start_time = time()  # Reset the timer here for each new search
     try:
-        results = scrape_guardian_on_my_radar(keyword)
-        if not results:
-            logger.warning(f"No articles found for keyword: {keyword}")
-            return jsonify({"results": [], "time_taken": 0})
-        formatted_results = format_results_with_ai(results, keyword)
+        with track_timings() as timings:
+            # Identical searches already in flight share that one's results
+            formatted_results, shared = search_flight.do(keyword, lambda: run_search(keyword))
+            if shared:
+                metrics.inc('searches_coalesced_total')
+                metrics.count_for_request('coalesced')
         time_taken = time() - start_time
-        return jsonify({"results": formatted_results, "time_taken": time_taken})
+        metrics.observe('search_seconds', time_taken)
+        response = {"results": formatted_results, "time_taken": time_taken}
+        if timings is not None:
+            response["timings"] = timings.as_dict()
+        return jsonify(response)
     except Exception as e:
         logger.exception(f"Error occurred during search for keyword '{keyword}': {str(e)}")
         return jsonify({"error": "An error occurred during the search. Please try again."}), 500
 
-@lru_cache(maxsize=100)
-def extract_external_links(html_content):
-    soup = BeautifulSoup(html_content, 'lxml')
-    links = {}
-    content = soup.find('div', class_='content__article-body')
-    if content:
-        for a in content.find_all('a', attrs={'data-link-name': ['in body link', 'auto-linked-tag']}):
-            if not a['href'].startswith(('https://www.theguardian.com', 'http://www.theguardian.com', '/')):
-                links[a.text.strip()] = a['href']
-        
-        keywords = ['recommends', 'recommendation', 'suggests', 'favourite', 'favorite', 'pick']
-        for p in content.find_all('p'):
-            if any(keyword in p.text.lower() for keyword in keywords):
-                for a in p.find_all('a', href=True):
-                    if not a['href'].startswith(('https://www.theguardian.com', 'http://www.theguardian.com', '/')):
-                        links[a.text.strip()] = a['href']
-        
-        for p in content.find_all('p'):
-            colon_splits = re.split(r':\s*', p.text)
-            if len(colon_splits) > 1:
-                for a in p.find_all('a', href=True):
-                    if not a['href'].startswith(('https://www.theguardian.com', 'http://www.theguardian.com', '/')):
-                        links[a.text.strip()] = a['href']
-    
-    return links
+def run_search(keyword):
+    results = scrape_guardian_on_my_radar(keyword)
+    if not results:
+        logger.warning(f"No articles found for keyword: {keyword}")
+        return []
+    return format_results_with_ai(results, keyword)
+
+@app.route('/search/stream', methods=['POST'])
+def search_stream():
+    """Stream results as newline-delimited JSON while they're being formatted.
+
+    Each line is an event: ``{"type": "result", "rank": ..., "result": {...}}``
+    per formatted result (in completion order; ``rank`` is its position in the
+    search ranking), then a final ``{"type": "summary", ...}`` with timings, or
+    ``{"type": "error", ...}`` if the search failed.
+    """
+    keyword = normalize_keyword(request.form['keyword'])
+
+    tracking = track_timings()
+
+    def generate():
+        start_time = time()
+        first_result_time = None
+        count = 0
+        try:
+            with tracking as timings:
+                # Identical searches in flight share the ranked matches, and
+                # iter_formatted_results shares the articles being formatted
+                results, shared = match_flight.do(keyword, lambda: scrape_guardian_on_my_radar(keyword))
+                if shared:
+                    metrics.inc('searches_coalesced_total')
+                    metrics.count_for_request('coalesced')
+                search_time = time() - start_time
+                if not results:
+                    logger.warning(f"No articles found for keyword: {keyword}")
+                for rank, formatted_result in iter_formatted_results(results, keyword, streaming=True):
+                    if first_result_time is None:
+                        first_result_time = time() - start_time
+                    count += 1
+                    yield json.dumps({"type": "result", "rank": rank, "result": formatted_result}) + "\n"
+            time_taken = time() - start_time
+            metrics.observe('search_seconds', time_taken)
+            summary = {
+                "type": "summary",
+                "count": count,
+                "matched": len(results),
+                "search_time": search_time,
+                "first_result_time": first_result_time,
+                "time_taken": time_taken
+            }
+            if timings is not None:
+                summary["timings"] = timings.as_dict()
+            yield json.dumps(summary) + "\n"
+        except Exception as e:
+            logger.exception(f"Error occurred during search for keyword '{keyword}': {str(e)}")
+            yield json.dumps({"type": "error", "error": "An error occurred during the search. Please try again."}) + "\n"
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    # Stop reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+BASE_URL = os.getenv('GUARDIAN_BASE_URL', 'https://www.theguardian.com').rstrip('/')
+SERIES_URL = f'{BASE_URL}/culture/series/on-my-radar'
+REFRESH_INTERVAL = int(os.getenv('REFRESH_INTERVAL', 900))
+REVALIDATE_INTERVAL = int(os.getenv('REVALIDATE_INTERVAL', 86400))
+# Worker processes share the article store; only the holder of the refresher
+# lease crawls, the others pick up its articles at most this often (seconds)
+REFRESH_LEASE_SECONDS = int(os.getenv('REFRESH_LEASE_SECONDS', 2 * REFRESH_INTERVAL))
+INDEX_SYNC_INTERVAL = float(os.getenv('INDEX_SYNC_INTERVAL', 5))
+# Crawls after which an article that keeps failing is given up on
+ARTICLE_MAX_ATTEMPTS = int(os.getenv('ARTICLE_MAX_ATTEMPTS', 5))
+SEARCH_RESULT_LIMIT = int(os.getenv('SEARCH_RESULT_LIMIT', 20))
+IMAGE_MAX_AGE = int(os.getenv('IMAGE_MAX_AGE', 365 * 24 * 3600))
+# Bump whenever the prompt or parsing changes so stale cached answers are ignored
+PROMPT_VERSION = 1
+LLM_BATCH_TOKEN_BUDGET = int(os.getenv('LLM_BATCH_TOKEN_BUDGET', 8000))
+# A request writes its articles' answers one after another, so batches are kept
+# small and run in parallel; a streamed search sends its first one on its own
+LLM_BATCH_MAX_ARTICLES = int(os.getenv('LLM_BATCH_MAX_ARTICLES', 3))
+LLM_FIRST_BATCH_ARTICLES = int(os.getenv('LLM_FIRST_BATCH_ARTICLES', 1))
+LLM_OUTPUT_TOKENS_PER_ARTICLE = 400
+
+article_store = ArticleStore()
+search_index = SearchIndex()
+crawler = Crawler()
+llm_cache = ResponseCache()
+image_cache = ImageCache(crawler.session, crawler.timeout)
+# /metrics reports the totals of every worker process sharing this database
+metrics_store = metrics.MetricsStore()
+metrics_store.start()
+search_flight = SingleFlight()
+match_flight = SingleFlight()
+# Articles being formatted right now, by result_key, so concurrent searches share them
+format_flight = SingleFlight()
+refresher_lock = threading.Lock()
+refresher_thread = None
+index_sync_lock = threading.Lock()
+index_seq = 0
+index_synced_at = 0.0
+
+def parse_article_urls(html):
+    soup = BeautifulSoup(html, 'lxml')
+    urls = []
+    for link in soup.find_all('a', href=True):
+        if 'on-my-radar' in link['href']:
+            article_url = link['href']
+            if article_url.startswith('/'):
+                article_url = BASE_URL + article_url
+            # Skip the series page itself, including its ?page=N pagination links
+            if article_url.split('?')[0] != SERIES_URL and article_url not in urls:
+                urls.append(article_url)
+    return urls
+
+def series_page_url(page_number):
+    return SERIES_URL if page_number == 1 else f'{SERIES_URL}?page={page_number}'
+
+def is_permanent_failure(error):
+    # A 404 or 410 won't go away by asking again; timeouts and throttling might
+    response = getattr(error, 'response', None)
+    return response is not None and 400 <= response.status_code < 500 and response.status_code not in (408, 429)
+
+def ingest_articles(urls, polite=False):
+    stored = 0
+    failed = []
+    for article_url, result in crawler.fetch_many(urls, article_store.validators(urls), polite=polite):
+        if isinstance(result, Exception):
+            logger.error(f"Error fetching article {article_url}: {result}")
+            metrics.inc('articles_total', state='failed')
+            if not is_permanent_failure(result):
+                failed.append(article_url)
+            continue
+        if result.not_modified:
+            metrics.inc('articles_total', state='not_modified')
+            continue
+        metrics.inc('articles_total', state='fetched')
+        try:
+            with metrics.timer('parse'):
+                article = extract_article(result.text)
+            with metrics.timer('store'):
+                article_store.save(article_url, result.text, article)
+                article_store.save_validators(article_url, result.etag, result.last_modified)
+            metrics.inc('articles_total', state='stored')
+            stored += 1
+        except Exception as e:
+            logger.error(f"Error processing article {article_url}: {e}")
+            metrics.inc('articles_total', state='failed')
+            failed.append(article_url)
+    return stored, failed
+
+def refresh_articles(force=False, max_pages=None, polite=True, leased=False):
+    """Walk the series archive newest first, storing articles we haven't seen.
+
+    The walk stops at the high-water mark, the newest article of the last
+    completed walk, so once the archive has been backfilled a poll only reads
+    the first page (conditionally, unless ``force``). Progress is checkpointed
+    in the store after every page, so a walk that is interrupted or cut short
+    by ``max_pages`` resumes where it left off on the next call. Articles that
+    failed are retried on the next call rather than by walking again, up to
+    ARTICLE_MAX_ATTEMPTS times, unless they failed with a client error such
+    as 404 or 410.
+
+    With ``leased`` the refresher lease is renewed before every page after the
+    first, and the walk pauses if another worker has taken it over.
+    """
+    state = article_store.crawl_state()
+    high_water_mark = state.get('high_water_mark')
+    newest = state.get('pending_mark')
+    page_number = int(state.get('next_page', 1))
+    known_urls = article_store.known_urls()
+
+    # Failed URLs are kept with the number of times they've failed
+    attempts = json.loads(state.get('failed', '{}'))
+    if isinstance(attempts, list):
+        # Checkpoints from before attempts were counted
+        attempts = dict.fromkeys(attempts, 1)
+    stored, retry_failed = ingest_articles(list(attempts), polite=polite)
+    failed = count_attempts(retry_failed, attempts)
+    pages = 0
+    finished = False
+    seen = set()
+    while max_pages is None or pages < max_pages:
+        if leased and pages and not hold_refresher_lease():
+            logger.warning("Lost the refresher lease to another worker")
+            break
+        url = series_page_url(page_number)
+        etag, last_modified = (None, None)
+        if page_number == 1 and high_water_mark and not force:
+            etag, last_modified = article_store.validators([url]).get(url, (None, None))
+        try:
+            page = crawler.fetch(url, etag, last_modified, stage='index_fetch', polite=polite)
+        except requests.HTTPError as e:
+            if e.response is not None and e.response.status_code == 404:
+                # Past the last page of the archive
+                finished = True
+            else:
+                logger.error(f"Error fetching series page {page_number}: {e}")
+            break
+        except Exception as e:
+            logger.error(f"Error fetching series page {page_number}: {e}")
+            break
+        pages += 1
+        if page.not_modified:
+            logger.info("Series page unchanged since the last poll")
+            finished = True
+            break
+
+        urls = [article_url for article_url in parse_article_urls(page.text) if article_url not in seen]
+        if not urls:
+            finished = True
+            break
+        seen.update(urls)
+        if newest is None:
+            newest = urls[0]
+            article_store.save_crawl_state(pending_mark=newest)
+        reached_mark = high_water_mark in urls
+        if reached_mark:
+            urls = urls[:urls.index(high_water_mark)]
 
-def fetch_url(url):
-    response = requests.get(url)
-    return response.text
+        page_stored, page_failed = ingest_articles([u for u in urls if u not in known_urls and u not in attempts],
+                                                   polite=polite)
+        stored += page_stored
+        failed.update(count_attempts(page_failed, failed))
+        if page_number == 1:
+            article_store.save_validators(url, page.etag, page.last_modified)
+        if reached_mark:
+            finished = True
+            break
+        page_number += 1
+        article_store.save_crawl_state(next_page=page_number, failed=json.dumps(failed))
+
+    if finished:
+        if newest and newest != high_water_mark:
+            logger.info(f"Series crawl caught up after {pages} pages; new high-water mark {newest}")
+        article_store.save_crawl_state(high_water_mark=newest or high_water_mark, pending_mark=None,
+                                       next_page=None, failed=json.dumps(failed) if failed else None)
+    else:
+        article_store.save_crawl_state(failed=json.dumps(failed) if failed else None)
+        logger.info(f"Series crawl paused at page {page_number}; it will resume from there")
+
+    logger.info(f"Stored {stored} new articles from {pages} series pages ({len(failed)} failed)")
+    return stored
+
+def count_attempts(failed, attempts):
+    """Return ``{url: attempts}`` for the failed URLs that are still worth retrying."""
+    counted = {}
+    for url in failed:
+        count = attempts.get(url, 0) + 1
+        if count >= ARTICLE_MAX_ATTEMPTS:
+            logger.warning(f"Giving up on {url} after {count} failed attempts")
+        else:
+            counted[url] = count
+    return counted
+
+def revalidate_articles(leased=False):
+    urls = list(article_store.known_urls())
+    stored = 0
+    failed = []
+    # In chunks, renewing the lease in between when we hold one
+    chunk_size = crawler.max_connections * 5
+    for start in range(0, len(urls), chunk_size):
+        if leased and start and not hold_refresher_lease():
+            logger.warning("Lost the refresher lease to another worker; stopping revalidation")
+            return
+        chunk_stored, chunk_failed = ingest_articles(urls[start:start + chunk_size], polite=True)
+        stored += chunk_stored
+        failed += chunk_failed
+    article_store.save_crawl_state(revalidated_at=time())
+    logger.info(f"Revalidated {len(urls)} articles: {stored} changed, {len(failed)} failed")
+
+def worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+def hold_refresher_lease():
+    """Take or renew the lease that makes this process the one that crawls."""
+    return article_store.acquire_lease('refresher', worker_id(), REFRESH_LEASE_SECONDS)
+
+def refresh_loop():
+    while True:
+        try:
+            if hold_refresher_lease():
+                # First pass continues the backfill the synchronous seed started
+                refresh_articles(leased=True)
+                # Kept in the store so a new leader carries on the same schedule
+                revalidated_at = article_store.crawl_state().get('revalidated_at')
+                if revalidated_at is None:
+                    article_store.save_crawl_state(revalidated_at=time())
+                elif time() - float(revalidated_at) >= REVALIDATE_INTERVAL:
+                    revalidate_articles(leased=True)
+        except Exception:
+            # e.g. the shared database staying locked; try again next round
+            logger.exception("Error refreshing articles")
+        sleep(REFRESH_INTERVAL)
+
+def sync_index(force=False):
+    """Index articles stored since we last looked, by this or any other worker process."""
+    global index_seq, index_synced_at
+    if not force and time() - index_synced_at < INDEX_SYNC_INTERVAL:
+        return
+    with index_sync_lock, metrics.timer('index_add'):
+        for seq, article in article_store.changed_since(index_seq):
+            search_index.add_article(article['url'], article['title'], article['paragraphs'])
+            index_seq = seq
+        index_synced_at = time()
+
+def ensure_started():
+    global refresher_thread
+    with refresher_lock:
+        if refresher_thread is not None:
+            return
+        sync_index(force=True)
+        if len(search_index) == 0:
+            # Seed synchronously from the first page so the very first search
+            # has something to match against; the refresher walks the rest of
+            # the archive. If another worker holds the lease it is seeding, so
+            # wait for its articles instead.
+            if hold_refresher_lease():
+                refresh_articles(force=True, max_pages=1, polite=False)
+                sync_index(force=True)
+            else:
+                deadline = time() + sum(crawler.timeout)
+                while len(search_index) == 0 and time() < deadline:
+                    sleep(0.5)
+                    sync_index(force=True)
+        refresher_thread = threading.Thread(target=refresh_loop, name='article-refresher', daemon=True)
+        refresher_thread.start()
 
 def scrape_guardian_on_my_radar(keyword):
-    base_url = 'https://www.theguardian.com'
-    url = f'{base_url}/culture/series/on-my-radar'
-    
-    try:
-        html = fetch_url(url)
-        soup = BeautifulSoup(html, 'lxml')
-    except Exception as e:
-        logger.error(f"Error fetching the Guardian page: {e}")
-        return []
-    
+    ensure_started()
+    sync_index()
+    with metrics.timer('index_search'):
+        matches = search_index.search(keyword, limit=SEARCH_RESULT_LIMIT)
+    with metrics.timer('store_lookup'):
+        stored_articles = article_store.get_many(url for url, _, _ in matches)
+    metrics.inc('search_articles_total', len(matches), state='matched')
+    metrics.count_for_request('matched', len(matches))
     articles = []
-    with ThreadPoolExecutor(max_workers=10) as executor:
-        future_to_url = {}
-        for link in soup.find_all('a', href=True):
-            if 'on-my-radar' in link['href']:
-                article_url = link['href']
-                if article_url.startswith('/'):
-                    article_url = base_url + article_url
-                future_to_url[executor.submit(fetch_url, article_url)] = article_url
-        
-        for future in as_completed(future_to_url):
-            article_url = future_to_url[future]
-            try:
-                article_html = future.result()
-                article_soup = BeautifulSoup(article_html, 'lxml')
-                if keyword.lower() in article_soup.text.lower():
-                    title_tag = article_soup.find('h1')
-                    title = title_tag.text.strip() if title_tag else "Untitled"
-                    
-                    image = extract_image(article_soup)
-                    snippet = extract_snippet(article_soup, keyword)
-                    recommended_by = extract_recommended_by(article_soup)
-                    recommender_info = extract_recommender_info(article_soup)
-                    external_links = extract_external_links(article_html)
-                    
-                    logger.info(f"Found article: {title}")
-                    
-                    articles.append({
-                        'title': title,
-                        'snippet': snippet,
-                        'image': image,
-                        'link': article_url,
-                        'recommended_by': recommended_by,
-                        'recommender_info': recommender_info,
-                        'external_links': external_links
-                    })
-            except Exception as e:
-                logger.error(f"Error processing article {article_url}: {e}")
-                continue
-    
+    for url, score, paragraphs in matches:
+        article = stored_articles.get(url)
+        if article is None:
+            continue
+        logger.info(f"Found article: {article['title']} (score {score:.2f})")
+        articles.append({
+            'title': article['title'],
+            'snippet': extract_snippet(article, paragraphs),
+            'image': article['image'],
+            'link': url,
+            'recommended_by': article['recommended_by'],
+            'recommender_info': article['recommender_info'],
+            'external_links': article['external_links']
+        })
     return articles
 
-@lru_cache(maxsize=100)
-def extract_recommender_info(soup):
-    paragraphs = soup.find_all('p')
-    for p in paragraphs:
-        if 'is a' in p.text or 'was a' in p.text:
-            return p.text.strip()
-    return "No additional information available about the recommender."
-
-@lru_cache(maxsize=100)
-def extract_image(soup):
-    image = None
-    main_content = soup.find('div', class_='content__main-column')
-    if main_content:
-        img_tag = main_content.find('img', class_='immersive-main-media__media')
-        if img_tag:
-            image = img_tag.get('src')
-    
-    if not image:
-        script_tag = soup.find('script', type='application/ld+json')
-        if script_tag:
-            try:
-                data = json.loads(script_tag.string)
-                if isinstance(data, list):
-                    for item in data:
-                        if isinstance(item, dict) and 'image' in item:
-                            image = item['image'].get('url') if isinstance(item['image'], dict) else item['image']
-                            break
-                elif isinstance(data, dict):
-                    image = data.get('image', {}).get('url') if isinstance(data.get('image'), dict) else data.get('image')
-            except json.JSONDecodeError:
-                pass
-    
-    if not image:
-        og_image = soup.find('meta', property='og:image')
-        if og_image:
-            image = og_image.get('content')
-    
-    if not image:
-        body_images = soup.select('.content__article-body img')
-        if body_images:
-            image = body_images[0].get('src')
-    
-    if image:
-        if isinstance(image, list):
-            image = image[0] if image else None
-        if isinstance(image, str) and not image.startswith('http'):
-            image = f"https:{image}"
-    
-    return image or '/static/placeholder.jpg'
-
-@lru_cache(maxsize=100)
-def extract_snippet(soup, keyword):
-    paragraphs = soup.find_all('p')
-    relevant_paragraphs = [p.text for p in paragraphs if keyword.lower() in p.text.lower()]
-    
-    if relevant_paragraphs:
-        snippet = ' '.join(relevant_paragraphs)
+def extract_snippet(article, matching_paragraphs):
+    if matching_paragraphs:
+        snippet = ' '.join(matching_paragraphs)
         return snippet[:497] + '...' if len(snippet) > 500 else snippet
     
-    meta_description = soup.find('meta', property='og:description')
-    if meta_description:
-        return meta_description['content']
+    if article['description']:
+        return article['description']
     
-    first_paragraph = soup.find('p')
-    if first_paragraph:
-        return first_paragraph.text.strip()
+    if article['paragraphs']:
+        return article['paragraphs'][0].strip()
     
     return "No relevant information found."
 
-@lru_cache(maxsize=100)
-def extract_recommended_by(soup):
-    title = soup.find('h1')
-    if title:
-        title_text = title.text.strip()
-        if "On my radar:" in title_text:
-            return title_text.split("On my radar:")[1].split("'s cultural highlights")[0].strip()
-    return "Unknown"
+def result_key(result, keyword):
+    # Everything the prompt is built from, plus the prompt version and model, so
+    # identical article/keyword pairs are only ever sent to the API once
+    return cache_key(PROMPT_VERSION, LLM_MODEL, keyword, result['title'], result['snippet'],
+                     result['link'], result['image'], result['external_links'])
+
+def estimate_tokens(text):
+    # Roughly four characters per token for English prose
+    return len(text) // 4 + 1
+
+def plan_batches(results, keyword, first_batch_size=None):
+    # Pack articles into as few requests as fit the token budget and article
+    # limit, counting each article's prompt text plus the room its answer needs
+    overhead = estimate_tokens(BATCH_INSTRUCTIONS.format(keyword=keyword, count=0))
+    batches = []
+    batch = []
+    batch_tokens = overhead
+    for result in results:
+        cost = estimate_tokens(describe_result(result)) + LLM_OUTPUT_TOKENS_PER_ARTICLE
+        max_articles = first_batch_size if first_batch_size and not batches else LLM_BATCH_MAX_ARTICLES
+        if batch and (batch_tokens + cost > LLM_BATCH_TOKEN_BUDGET or len(batch) >= max_articles):
+            batches.append(batch)
+            batch = []
+            batch_tokens = overhead
+        batch.append(result)
+        batch_tokens += cost
+    if batch:
+        batches.append(batch)
+    return batches
+
+def iter_formatted_results(results, keyword, streaming=False):
+    """Yield ``(rank, formatted result)`` pairs as soon as each one is ready.
+
+    Cached results come first, then each batch's results as its request
+    finishes; results with nothing relevant are skipped. When ``streaming``
+    the first batch holds LLM_FIRST_BATCH_ARTICLES articles, so something new
+    shows up after a short request. Articles another search is already
+    formatting aren't requested again; their results are shared. The
+    ``format`` stage doesn't count the time spent suspended at a ``yield``,
+    e.g. writing to a streaming client.
+    """
+    keys = [result_key(result, keyword) for result in results]
+    rank_for = {key: rank for rank, key in enumerate(keys)}
+    returned = 0
+    with metrics.timer('format') as format_timer:
+        with metrics.timer('llm_cache_lookup'):
+            cached = llm_cache.get_many(keys)
+
+        # One future per article still to format, whichever search requests it
+        pending = {}
+        claimed = {}
+        for key, result in zip(keys, results):
+            if key in cached:
+                continue
+            future, leader = format_flight.begin(key)
+            pending[future] = key
+            if leader:
+                claimed[key] = result
+        shared = len(pending) - len(claimed)
+        if shared:
+            metrics.inc('cache_requests_total', shared, cache='llm', result='coalesced')
+            metrics.count_for_request('llm_coalesced', shared)
+        batches = submit_batches(claimed, keyword, LLM_FIRST_BATCH_ARTICLES if streaming else None)
+
+        for key in keys:
+            if cached.get(key):
+                returned += 1
+                with format_timer.paused():
+                    yield rank_for[key], cached[key]
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = pending.pop(future)
+                try:
+                    formatted_result = future.result()
+                except Exception as e:
+                    logger.error(f"Error formatting result {results[rank_for[key]]['link']}: {e}")
+                    continue
+                if formatted_result:
+                    returned += 1
+                    with format_timer.paused():
+                        yield rank_for[key], formatted_result
+
+    metrics.inc('search_articles_total', returned, state='returned')
+    metrics.inc('search_articles_total', len(results) - returned, state='dropped')
+    metrics.count_for_request('returned', returned)
+    metrics.count_for_request('dropped', len(results) - returned)
+    metrics.count_for_request('llm_batches', batches)
+    logger.info(f"Formatted {len(results)} results in {batches} batches, LLM cache: {llm_cache.stats()}")
+
+def submit_batches(claimed, keyword, first_batch_size=None):
+    """Format the claimed ``{key: result}`` articles in batches on the I/O pool.
+
+    Each key's future in ``format_flight`` is settled as its batch finishes,
+    whether or not the search that submitted it is still reading. Returns the
+    number of batches.
+    """
+    submitted = set()
+    try:
+        batches = plan_batches(list(claimed.values()), keyword, first_batch_size)
+        key_for = {id(result): key for key, result in claimed.items()}
+        for batch in batches:
+            batch_keys = [key_for[id(result)] for result in batch]
+            future = io_executor.submit(format_batch, batch, batch_keys, keyword)
+            submitted.update(batch_keys)
+            future.add_done_callback(partial(contextvars.copy_context().run, settle_batch, batch, batch_keys, keyword))
+    except BaseException as e:
+        for key in claimed.keys() - submitted:
+            format_flight.settle(key, exception=e)
+        raise
+    return len(batches)
+
+def settle_batch(batch, keys, keyword, future):
+    try:
+        formatted = future.result()
+    except Exception as e:
+        # Fan out from this callback rather than inside the failed task, so
+        # the per-article requests run in parallel on the pool
+        logger.warning(f"Batch of {len(batch)} articles failed ({e}), falling back to one request per article")
+        for result, key in zip(batch, keys):
+            single = io_executor.submit(format_single_result, result, keyword, key)
+            single.add_done_callback(lambda done, key=key: format_flight.settle(key, done.result()))
+        return
+    for key in keys:
+        format_flight.settle(key, formatted.get(key))
 
 def format_results_with_ai(results, keyword):
-    formatted_results = []
-    with ThreadPoolExecutor(max_workers=5) as executor:
-        future_to_result = {executor.submit(format_single_result, result, keyword): result for result in results}
-        for future in as_completed(future_to_result):
-            formatted_result = future.result()
-            if formatted_result:
-                formatted_results.append(formatted_result)
-    return formatted_results
-
-def format_single_result(result, keyword):
-    external_links_str = "\n".join([f"{key}: {value}" for key, value in result['external_links'].items()])
-    prompt = f"""Analyze this cultural recommendation about {keyword}:
+    formatted_results = dict(iter_formatted_results(results, keyword))
+    # Keep the search ranking rather than completion order
+    return [formatted_results[rank] for rank in sorted(formatted_results)]
+
+def format_batch(batch, keys, keyword):
+    return llm_cache.compute_many(keys, lambda _: analyze_batch(batch, keyword))
 
-    Title: {result['title']}
+def format_single_result(result, keyword, key=None):
+    key = key or result_key(result, keyword)
+    try:
+        return llm_cache.get_or_compute(key, lambda: analyze_result(result, keyword))
+    except Exception as e:
+        logger.error(f"Error formatting result {result['link']}: {e}")
+        return None
+
+def complete_chat(messages, max_tokens):
+    try:
+        with metrics.timer('llm'):
+            reply = get_client().complete(messages, model=LLM_MODEL, max_tokens=max_tokens)
+    except Exception:
+        metrics.inc('openai_requests_total', outcome='error')
+        raise
+    metrics.inc('openai_requests_total', outcome='ok')
+    return reply
+
+def describe_result(result):
+    external_links_str = "\n".join([f"{key}: {value}" for key, value in result['external_links'].items()])
+    return f"""Title: {result['title']}
     Snippet: {result['snippet']}
     Link: {result['link']}
     Image: {result['image']}
     External Links:
-    {external_links_str}
+    {external_links_str}"""
+
+def build_result(result, recommendation, recommended_by, recommender_info, snippet):
+    # Find an exact match for the recommendation in the external links
+    recommendation_link = next((url for name, url in result['external_links'].items() 
+                                if name.lower() == recommendation.lower()), None)
+    
+    return {
+        'title': recommendation,
+        'snippet': snippet,
+        'image': result['image'],
+        'recommended_by': recommended_by,
+        'recommender_info': recommender_info,
+        'link': result['link'],
+        'recommendation_link': recommendation_link
+    }
+
+BATCH_FIELDS = ('recommendation', 'recommended_by', 'recommender_info', 'snippet')
+
+BATCH_INSTRUCTIONS = """Analyze these {count} cultural recommendations about {keyword}. For each article:
+
+    1. EXACT name/title of recommended {keyword}.
+    2. Name of recommender.
+    3. Brief description of recommender.
+    4. 3-4 sentence paragraph about the recommendation, including why it was recommended and interesting details.
+    5. DO NOT suggest an external link. Only use links explicitly provided in that article's External Links section.
+
+    Respond with only a JSON array of exactly {count} items, one per article and in the same order.
+    Each item is either an object
+    {{"recommendation": "EXACT name/title", "recommended_by": "Name", "recommender_info": "Brief description", "snippet": "Detailed paragraph"}}
+    or null if the article has no relevant information.
+    """
+
+def analyze_batch(batch, keyword):
+    articles = "\n\n".join(f"Article {number}:\n    {describe_result(result)}"
+                           for number, result in enumerate(batch, 1))
+    prompt = BATCH_INSTRUCTIONS.format(count=len(batch), keyword=keyword) + "\n" + articles
+
+    ai_result = complete_chat(
+        [
+            {"role": "system", "content": "You are a helpful assistant specialized in analyzing cultural recommendations."},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=LLM_OUTPUT_TOKENS_PER_ARTICLE * len(batch)
+    )
+
+    # Tolerate the array being wrapped in a ```json fence
+    ai_result = re.sub(r'^```(?:json)?\s*|\s*```$', '', ai_result.strip())
+    items = json.loads(ai_result)
+    if not isinstance(items, list) or len(items) != len(batch):
+        raise ValueError(f"expected a JSON array of {len(batch)} items")
+
+    formatted = []
+    for result, item in zip(batch, items):
+        if item is None:
+            formatted.append(None)
+            continue
+        if not isinstance(item, dict) or not all(isinstance(item.get(field), str) and item[field].strip()
+                                                 for field in BATCH_FIELDS):
+            raise ValueError(f"invalid item for {result['link']}")
+        formatted.append(build_result(result, *(item[field].strip() for field in BATCH_FIELDS)))
+    return formatted
+
+def analyze_result(result, keyword):
+    prompt = f"""Analyze this cultural recommendation about {keyword}:
+
+    {describe_result(result)}
 
     1. EXACT name/title of recommended {keyword}.
     2. Name of recommender.
@@ -238,20 +682,15 @@ def format_single_result(result, keyword):
     If no relevant information, respond with 'No relevant information'.
     """
     
-    try:
-        response = openai.ChatCompletion.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant specialized in analyzing cultural recommendations."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=400
-        )
-        ai_result = response.choices[0].message.content.strip()
-    except Exception as e:
-        logger.error(f"Error calling OpenAI API: {e}")
-        return None
+    ai_result = complete_chat(
+        [
+            {"role": "system", "content": "You are a helpful assistant specialized in analyzing cultural recommendations."},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=LLM_OUTPUT_TOKENS_PER_ARTICLE
+    )
 
+    # A definite "nothing here" is worth caching; anything that raises is not
     if ai_result == "No relevant information":
         return None
 
@@ -260,24 +699,22 @@ def format_single_result(result, keyword):
     recommender_info_match = re.search(r'Recommender info: (.+)', ai_result)
     snippet_match = re.search(r'Snippet: (.+)', ai_result, re.DOTALL)
     
-    if all([recommendation_match, recommended_by_match, recommender_info_match, snippet_match]):
-        recommendation = recommendation_match.group(1).strip()
-        
-        # Find an exact match for the recommendation in the external links
-        recommendation_link = next((url for name, url in result['external_links'].items() 
-                                    if name.lower() == recommendation.lower()), None)
-        
-        return {
-            'title': recommendation,
-            'snippet': snippet_match.group(1).strip(),
-            'image': result['image'],
-            'recommended_by': recommended_by_match.group(1).strip(),
-            'recommender_info': recommender_info_match.group(1).strip(),
-            'link': result['link'],
-            'recommendation_link': recommendation_link
-        }
-    
-    return None
+    if not all([recommendation_match, recommended_by_match, recommender_info_match, snippet_match]):
+        raise ValueError(f"Unexpected response format: {ai_result[:100]!r}")
+
+    return build_result(
+        result,
+        recommendation_match.group(1).strip(),
+        recommended_by_match.group(1).strip(),
+        recommender_info_match.group(1).strip(),
+        snippet_match.group(1).strip()
+    )
+
+@app.route('/metrics')
+def metrics_endpoint():
+    if not metrics.METRICS_ENABLED:
+        return "Metrics are disabled", 404
+    return Response(metrics_store.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/proxy_image')
 def proxy_image():
@@ -285,20 +722,50 @@ def proxy_image():
     if not url:
         logger.warning("No URL provided for proxy_image")
         return "No URL provided", 400
-    
+    if not image_cache.is_allowed(url):
+        logger.warning(f"Refusing to proxy image from disallowed host: {url}")
+        return "Image host not allowed", 403
+
+    width = image_cache.snap_width(request.args.get('w', type=int))
+    key = image_cache.key(url, width)
+    headers = {
+        'ETag': f'"{key}"',
+        'Cache-Control': f'public, max-age={IMAGE_MAX_AGE}, immutable'
+    }
+    if request.if_none_match.contains(key):
+        metrics.inc('cache_requests_total', cache='image', result='not_modified')
+        return Response(status=304, headers=headers)
+
     try:
-        response = requests.get(url, timeout=10)
-        content = response.content
-        content_type = response.headers.get('Content-Type', 'image/jpeg')
-        logger.info(f"Successfully proxied image from {url}")
-        return send_file(
-            BytesIO(content),
-            mimetype=content_type,
-            as_attachment=False
-        )
+        cached = image_cache.get(key)
+        metrics.inc('cache_requests_total', cache='image', result='hit' if cached else 'miss')
+        if cached:
+            path, content_type = cached
+        elif width:
+            path, content_type = image_cache.thumbnail(url, width)
+        else:
+            try:
+                path, content_type = image_cache.original(url)
+            except ImageTooLarge:
+                content_type, chunks = image_cache.stream(url)
+                logger.info(f"Streaming uncached image from {url}")
+                return Response(chunks, mimetype=content_type, headers=headers)
+        response = send_file(path, mimetype=content_type, as_attachment=False, etag=False, conditional=False)
+        response.headers.update(headers)
+        return response
     except Exception as e:
         logger.error(f"Error proxying image from {url}: {str(e)}")
         return "Error loading image", 500
 
+@app.cli.command('crawl')
+@click.option('--pages', type=int, default=None, help='Stop after this many series pages (resumable).')
+@click.option('--restart', is_flag=True, help='Forget the checkpoint and high-water mark and walk the whole archive.')
+def crawl_command(pages, restart):
+    """Backfill the series archive in the foreground, resuming any interrupted crawl."""
+    if restart:
+        article_store.save_crawl_state(high_water_mark=None, pending_mark=None, next_page=None)
+    stored = refresh_articles(force=restart, max_pages=pages)
+    click.echo(f"Stored {stored} new articles; {article_store.count()} in the store")
+
 if __name__ == '__main__':
     app.run(debug=True, port=5007)
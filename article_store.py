@@ -0,0 +1,158 @@
+import json
+import os
+import sqlite3
+import threading
+from time import time
+
+DB_PATH = os.getenv('ARTICLE_DB_PATH', 'articles.db')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    url TEXT PRIMARY KEY,
+    html TEXT NOT NULL,
+    title TEXT,
+    image TEXT,
+    recommended_by TEXT,
+    recommender_info TEXT,
+    external_links TEXT,
+    paragraphs TEXT,
+    description TEXT,
+    fetched_at REAL
+);
+CREATE TABLE IF NOT EXISTS validators (
+    url TEXT PRIMARY KEY,
+    etag TEXT,
+    last_modified TEXT
+);
+CREATE TABLE IF NOT EXISTS crawl_state (
+    name TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS article_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    url TEXT UNIQUE NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    name TEXT PRIMARY KEY,
+    holder TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+FIELDS = ('url', 'title', 'image', 'recommended_by', 'recommender_info',
+          'external_links', 'paragraphs', 'description', 'fetched_at')
+
+
+class ArticleStore:
+    """SQLite-backed store of fetched On my radar articles, keyed by URL.
+
+    Several processes can share one database: every save is logged with an
+    increasing sequence number so other processes can pick up changes with
+    ``changed_since``, and ``acquire_lease`` lets them agree on which one
+    does the crawling.
+    """
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.executescript(SCHEMA)
+            # Databases from before the log existed
+            conn.execute('INSERT OR IGNORE INTO article_log (url) SELECT url FROM articles ORDER BY fetched_at')
+
+    def _conn(self):
+        # sqlite3 connections can't be shared between threads, so keep one per thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Safe with WAL; a power cut can lose the last commits but not corrupt anything
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def count(self):
+        return self._conn().execute('SELECT COUNT(*) FROM articles').fetchone()[0]
+
+    def known_urls(self):
+        return {row[0] for row in self._conn().execute('SELECT url FROM articles')}
+
+    def save(self, url, html, article):
+        with self._conn() as conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO articles (url, html, title, image, recommended_by, '
+                'recommender_info, external_links, paragraphs, description, fetched_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (url, html, article.title, article.image, article.recommended_by,
+                 article.recommender_info, json.dumps(article.external_links),
+                 json.dumps(article.paragraphs), article.description, time())
+            )
+            # Replacing moves the URL to the end of the log
+            conn.execute('INSERT OR REPLACE INTO article_log (url) VALUES (?)', (url,))
+
+    def validators(self, urls=None):
+        """Return ``{url: (etag, last_modified)}`` for conditional GETs."""
+        if urls is None:
+            rows = self._conn().execute('SELECT url, etag, last_modified FROM validators')
+        else:
+            urls = list(urls)
+            rows = self._conn().execute(
+                f"SELECT url, etag, last_modified FROM validators WHERE url IN ({', '.join('?' * len(urls))})", urls
+            )
+        return {url: (etag, last_modified) for url, etag, last_modified in rows}
+
+    def save_validators(self, url, etag, last_modified):
+        with self._conn() as conn:
+            conn.execute('INSERT OR REPLACE INTO validators (url, etag, last_modified) VALUES (?, ?, ?)',
+                         (url, etag, last_modified))
+
+    def crawl_state(self):
+        """Return the series crawl's checkpoint as a ``{name: value}`` dict."""
+        return dict(self._conn().execute('SELECT name, value FROM crawl_state').fetchall())
+
+    def save_crawl_state(self, **values):
+        """Set checkpoint values; None removes a value."""
+        with self._conn() as conn:
+            for name, value in values.items():
+                if value is None:
+                    conn.execute('DELETE FROM crawl_state WHERE name = ?', (name,))
+                else:
+                    conn.execute('INSERT OR REPLACE INTO crawl_state (name, value) VALUES (?, ?)', (name, str(value)))
+
+    def acquire_lease(self, name, holder, ttl):
+        """Take or renew the lease ``name`` for ``ttl`` seconds; True if ``holder`` now has it."""
+        now = time()
+        with self._conn() as conn:
+            conn.execute('INSERT OR IGNORE INTO leases (name, holder, expires_at) VALUES (?, ?, 0)', (name, holder))
+            cursor = conn.execute('UPDATE leases SET holder = ?, expires_at = ? '
+                                  'WHERE name = ? AND (holder = ? OR expires_at < ?)',
+                                  (holder, now + ttl, name, holder, now))
+        return cursor.rowcount == 1
+
+    def changed_since(self, seq):
+        """Yield ``(seq, article)`` for every article saved after log position ``seq``, oldest first."""
+        rows = self._conn().execute(
+            f"SELECT article_log.seq, {', '.join('articles.' + field for field in FIELDS)} "
+            "FROM article_log JOIN articles ON articles.url = article_log.url "
+            "WHERE article_log.seq > ? ORDER BY article_log.seq", (seq,)
+        )
+        for row in rows:
+            article = self._to_article(row)
+            yield article.pop('seq'), article
+
+    def get_many(self, urls):
+        urls = list(urls)
+        if not urls:
+            return {}
+        rows = self._conn().execute(
+            f"SELECT {', '.join(FIELDS)} FROM articles WHERE url IN ({', '.join('?' * len(urls))})", urls
+        )
+        return {row['url']: self._to_article(row) for row in rows}
+
+    @staticmethod
+    def _to_article(row):
+        article = dict(row)
+        article['external_links'] = json.loads(article['external_links'])
+        article['paragraphs'] = json.loads(article['paragraphs'])
+        return article
@@ -0,0 +1,180 @@
+"""Single-pass extract_article() against the old per-field BeautifulSoup extractors.
+
+    python benchmarks/bench_extract.py [--runs 50] [FILE.html ...]
+
+Without files a synthetic page shaped like a Guardian "On my radar" column
+(with the usual head scripts and navigation chrome) is used.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import sys
+from time import perf_counter
+
+from bs4 import BeautifulSoup
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import extract
+from extract import extract_article
+
+
+# The extractors app.py used before extract.py, kept verbatim (minus their
+# lru_cache decorators, which never hit) as the baseline.
+
+def legacy_extract_external_links(html_content):
+    soup = BeautifulSoup(html_content, 'lxml')
+    links = {}
+    content = soup.find('div', class_='content__article-body')
+    if content:
+        for a in content.find_all('a', attrs={'data-link-name': ['in body link', 'auto-linked-tag']}):
+            if not a['href'].startswith(('https://www.theguardian.com', 'http://www.theguardian.com', '/')):
+                links[a.text.strip()] = a['href']
+
+        keywords = ['recommends', 'recommendation', 'suggests', 'favourite', 'favorite', 'pick']
+        for p in content.find_all('p'):
+            if any(keyword in p.text.lower() for keyword in keywords):
+                for a in p.find_all('a', href=True):
+                    if not a['href'].startswith(('https://www.theguardian.com', 'http://www.theguardian.com', '/')):
+                        links[a.text.strip()] = a['href']
+
+        for p in content.find_all('p'):
+            colon_splits = re.split(r':\s*', p.text)
+            if len(colon_splits) > 1:
+                for a in p.find_all('a', href=True):
+                    if not a['href'].startswith(('https://www.theguardian.com', 'http://www.theguardian.com', '/')):
+                        links[a.text.strip()] = a['href']
+
+    return links
+
+
+def legacy_extract_recommender_info(soup):
+    for p in soup.find_all('p'):
+        if 'is a' in p.text or 'was a' in p.text:
+            return p.text.strip()
+    return "No additional information available about the recommender."
+
+
+def legacy_extract_image(soup):
+    image = None
+    main_content = soup.find('div', class_='content__main-column')
+    if main_content:
+        img_tag = main_content.find('img', class_='immersive-main-media__media')
+        if img_tag:
+            image = img_tag.get('src')
+
+    if not image:
+        script_tag = soup.find('script', type='application/ld+json')
+        if script_tag:
+            try:
+                data = json.loads(script_tag.string)
+                if isinstance(data, list):
+                    for item in data:
+                        if isinstance(item, dict) and 'image' in item:
+                            image = item['image'].get('url') if isinstance(item['image'], dict) else item['image']
+                            break
+                elif isinstance(data, dict):
+                    image = data.get('image', {}).get('url') if isinstance(data.get('image'), dict) else data.get('image')
+            except json.JSONDecodeError:
+                pass
+
+    if not image:
+        og_image = soup.find('meta', property='og:image')
+        if og_image:
+            image = og_image.get('content')
+
+    if not image:
+        body_images = soup.select('.content__article-body img')
+        if body_images:
+            image = body_images[0].get('src')
+
+    if image:
+        if isinstance(image, list):
+            image = image[0] if image else None
+        if isinstance(image, str) and not image.startswith('http'):
+            image = f"https:{image}"
+
+    return image or '/static/placeholder.jpg'
+
+
+def legacy_extract_recommended_by(soup):
+    title = soup.find('h1')
+    if title:
+        title_text = title.text.strip()
+        if "On my radar:" in title_text:
+            return title_text.split("On my radar:")[1].split("'s cultural highlights")[0].strip()
+    return "Unknown"
+
+
+def legacy_extract(html):
+    soup = BeautifulSoup(html, 'lxml')
+    title_tag = soup.find('h1')
+    meta_description = soup.find('meta', property='og:description')
+    return {
+        'title': title_tag.text.strip() if title_tag else "Untitled",
+        'image': legacy_extract_image(soup),
+        'recommended_by': legacy_extract_recommended_by(soup),
+        'recommender_info': legacy_extract_recommender_info(soup),
+        'external_links': legacy_extract_external_links(html),
+        'paragraphs': [p.text for p in soup.find_all('p')],
+        'description': meta_description['content'] if meta_description else None,
+    }
+
+
+def synthetic_page():
+    chrome = ''.join(f'<li><a href="/section-{i}" data-link-name="nav2 : primary : {i}">Section {i}</a></li>'
+                     for i in range(150))
+    scripts = ''.join(f'<script>window.guardian.config{i} = {json.dumps({"k": "v" * 400})};</script>'
+                      for i in range(40))
+    categories = ['Music', 'Books', 'TV', 'Theatre', 'Art', 'Podcast', 'Restaurant', 'Film']
+    body = ''.join(
+        f'<h2>{category}</h2><p>{category}: <a href="https://example.com/{category.lower()}" '
+        f'data-link-name="in body link">The {category} Thing</a> is my favourite pick this year. '
+        + 'It is beautifully made and I keep going back to it. ' * 6 + '</p>'
+        for category in categories
+    )
+    return f'''<!DOCTYPE html><html><head><meta charset="utf-8">
+<title>On my radar: Jane Doe's cultural highlights | Culture | The Guardian</title>
+<meta property="og:image" content="https://i.guim.co.uk/img/media/abc/master/1000.jpg">
+<meta property="og:description" content="The singer on her favourite books, TV and music">
+<script type="application/ld+json">{json.dumps([{"@type": "NewsArticle", "image": ["https://i.guim.co.uk/img/media/abc/master/2000.jpg"]}])}</script>
+{scripts}</head><body><header><nav><ul>{chrome}</ul></nav></header>
+<div class="content__main-column"><h1>On my radar: Jane Doe's cultural highlights</h1>
+<div class="content__article-body"><p>Jane Doe is a singer-songwriter from Glasgow. Her new album is out now.</p>
+{body}</div></div><footer><ul>{chrome}</ul></footer></body></html>'''
+
+
+def timeit(func, html, runs):
+    timings = []
+    for _ in range(runs):
+        start = perf_counter()
+        func(html)
+        timings.append((perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    pages = [(path, open(path, encoding='utf-8').read()) for path in args.files] or [('synthetic', synthetic_page())]
+    print(f"{'page':<30} {'size':>8} {'legacy':>10} {'single-pass':>12} {'cached':>9} {'speedup':>8}  match")
+    for name, html in pages:
+        legacy = legacy_extract(html)
+        record = extract_article(html)
+        match = all(getattr(record, key) == value for key, value in legacy.items())
+
+        legacy_ms = timeit(legacy_extract, html, args.runs)
+        # Uncached parse time: call the parser directly
+        single_ms = timeit(extract._parse, html, args.runs)
+        cached_ms = timeit(extract_article, html, args.runs)
+        print(f"{os.path.basename(name)[:30]:<30} {len(html) // 1024:>6}KB {legacy_ms:>8.2f}ms {single_ms:>10.2f}ms "
+              f"{cached_ms:>7.3f}ms {legacy_ms / single_ms:>7.1f}x  {'yes' if match else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
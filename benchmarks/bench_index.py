@@ -0,0 +1,76 @@
+"""Build/query latency of SearchIndex on synthetic corpora.
+
+    python benchmarks/bench_index.py [--sizes 1000 10000] [--queries 200]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+from time import perf_counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from search_index import SearchIndex
+
+TOPICS = ['music', 'books', 'theatre', 'art', 'tv', 'film', 'podcast', 'restaurant',
+          'youtube', 'album', 'novel', 'gallery', 'exhibition', 'comedy', 'dance']
+
+
+def make_vocabulary(size, rng):
+    letters = 'abcdefghijklmnopqrstuvwxyz'
+    return [''.join(rng.choice(letters) for _ in range(rng.randint(3, 10))) for _ in range(size)]
+
+
+def make_corpus(article_count, rng, paragraphs_per_article=12, words_per_paragraph=60):
+    vocabulary = make_vocabulary(20000, rng) + TOPICS * 50
+    # Zipf-ish word frequencies, like real prose
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    for i in range(article_count):
+        paragraphs = [' '.join(rng.choices(vocabulary, weights, k=words_per_paragraph))
+                      for _ in range(paragraphs_per_article)]
+        yield f'https://example.com/on-my-radar-{i}', f'On my radar: Person {i}', paragraphs
+
+
+def bench(article_count, query_count, rng):
+    corpus = list(make_corpus(article_count, rng))
+    index = SearchIndex()
+    start = perf_counter()
+    for url, title, paragraphs in corpus:
+        index.add_article(url, title, paragraphs)
+    build_time = perf_counter() - start
+
+    queries = [rng.choice(TOPICS) if rng.random() < 0.5 else ' '.join(rng.sample(TOPICS, 2))
+               for _ in range(query_count)]
+    timings = []
+    for query in queries:
+        start = perf_counter()
+        index.search(query, limit=20)
+        timings.append((perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'articles': article_count,
+        'paragraphs': article_count * 12,
+        'build_s': build_time,
+        'query_mean_ms': statistics.mean(timings),
+        'query_p95_ms': timings[int(len(timings) * 0.95) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'articles':>10} {'paragraphs':>12} {'build':>9} {'query (mean)':>14} {'query (p95)':>13}")
+    for size in args.sizes:
+        result = bench(size, args.queries, rng)
+        print(f"{result['articles']:>10,} {result['paragraphs']:>12,} {result['build_s']:>8.2f}s "
+              f"{result['query_mean_ms']:>11.2f} ms {result['query_p95_ms']:>10.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
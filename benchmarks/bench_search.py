@@ -0,0 +1,304 @@
+"""End-to-end /search benchmark against recorded fixtures and a stub LLM.
+
+    python benchmarks/bench_search.py [--clients 16] [--requests 400] [--stream]
+        [--llm-latency 0.2] [--llm-latency-per-article 0.2]
+    python benchmarks/bench_search.py --compare benchmarks/results/OLD.json [NEW.json]
+
+Everything runs offline: fixture_server.py replays the recorded Guardian pages,
+the app is pointed at it with GUARDIAN_BASE_URL and formats results with the
+deterministic stub LLM (LLM_CLIENT=stub) using fresh temporary databases.
+The stub takes a fixed time per call plus a time per article in the prompt,
+like a real model writing one answer after another, so packing more articles
+into a request isn't free. Reported:
+
+* extract - uncached parse time per fixture article
+* ingest  - cold crawl of every series page and article, with the peak
+  Python allocation while doing it (tracemalloc)
+* search  - throughput and p50/p95/p99 latency of /search under concurrent
+  load: cold (one request per keyword, empty LLM cache), burst (every
+  client searching the same new keyword at once) and warm. With
+  ``--stream`` the UI's /search/stream is load-tested instead, and the time
+  to the first streamed result is reported as well. In-process runs also
+  count the stub LLM calls each phase made
+* memory  - peak RSS of the whole run
+
+Results are written to benchmarks/results/<time>-<commit>.json. With
+``--compare OLD.json`` the new run is diffed against OLD; given two files
+they are diffed without running anything. ``--target URL`` load-tests an
+already running server instead; only the search numbers are reported then:
+
+    python benchmarks/fixture_server.py --port 8001 &
+    GUARDIAN_BASE_URL=http://127.0.0.1:8001 LLM_CLIENT=stub LLM_STUB_LATENCY=0.2 \\
+        LLM_STUB_LATENCY_PER_ARTICLE=0.2 ARTICLE_DB_PATH=/tmp/bench.db \\
+        LLM_CACHE_PATH=/tmp/bench-llm.db gunicorn wsgi:app &
+    python benchmarks/bench_search.py --target http://127.0.0.1:8000 --clients 64
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from time import perf_counter
+
+import requests
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from fixture_server import FIXTURES_DIR, FixtureServer
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+KEYWORDS = ['music', 'books', 'tv', 'theatre', 'art', 'podcast', 'restaurant', 'film',
+            'youtube', 'game', 'album', 'novel', 'exhibition', 'documentary']
+BURST_KEYWORD = 'memoir'
+# Lower is better for everything compared except these
+HIGHER_IS_BETTER = ('throughput_rps',)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+def summarise(latencies, errors, elapsed, first_results=None):
+    ms = [latency * 1000 for latency in latencies] or [0.0]
+    summary = {
+        'requests': len(latencies) + errors,
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(percentile(ms, 0.50), 2),
+        'p95_ms': round(percentile(ms, 0.95), 2),
+        'p99_ms': round(percentile(ms, 0.99), 2),
+        'max_ms': round(max(ms), 2),
+    }
+    if first_results is not None:
+        first_ms = [latency * 1000 for latency in first_results] or [0.0]
+        summary.update({
+            'first_result_p50_ms': round(percentile(first_ms, 0.50), 2),
+            'first_result_p95_ms': round(percentile(first_ms, 0.95), 2),
+            'first_result_p99_ms': round(percentile(first_ms, 0.99), 2),
+        })
+    return summary
+
+
+def post_search(session, url, keyword):
+    response = session.post(f'{url}/search', data={'keyword': keyword}, timeout=120)
+    return response.status_code == 200 and 'results' in response.json(), None
+
+
+def post_stream(session, url, keyword):
+    """Read a /search/stream response; returns ``(ok, seconds to the first result)``."""
+    start = perf_counter()
+    first_result = None
+    last = None
+    with session.post(f'{url}/search/stream', data={'keyword': keyword}, timeout=120, stream=True) as response:
+        if response.status_code != 200:
+            return False, None
+        for line in response.iter_lines():
+            last = json.loads(line)
+            if last['type'] == 'result' and first_result is None:
+                first_result = perf_counter() - start
+    return last is not None and last['type'] == 'summary', first_result
+
+
+def load_test(url, keywords, clients, stream=False):
+    """POST one search per keyword with ``clients`` concurrent users."""
+    local = threading.local()
+    post = post_stream if stream else post_search
+
+    def one(keyword):
+        session = getattr(local, 'session', None)
+        if session is None:
+            session = local.session = requests.Session()
+        start = perf_counter()
+        try:
+            ok, first_result = post(session, url, keyword)
+        except (requests.RequestException, ValueError):
+            ok, first_result = False, None
+        return ok, perf_counter() - start, first_result
+
+    start = perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        outcomes = list(executor.map(one, keywords))
+    elapsed = perf_counter() - start
+    first_results = [first for ok, _, first in outcomes if ok and first is not None] if stream else None
+    return summarise([latency for ok, latency, _ in outcomes if ok], sum(1 for ok, _, _ in outcomes if not ok),
+                     elapsed, first_results)
+
+
+def bench_extract(fixtures, runs):
+    import extract
+
+    per_article = []
+    for path, (body, _) in fixtures.items():
+        if path.split('?')[0].endswith('/series/on-my-radar'):
+            continue
+        html = body.decode('utf-8')
+        timings = []
+        for _ in range(runs):
+            start = perf_counter()
+            extract._parse(html)
+            timings.append((perf_counter() - start) * 1000)
+        per_article.append(statistics.median(timings))
+    return {
+        'articles': len(per_article),
+        'mean_ms': round(statistics.mean(per_article), 3),
+        'p95_ms': round(percentile(per_article, 0.95), 3),
+    }
+
+
+def run_in_process(args):
+    server = FixtureServer(args.fixtures, args.fetch_latency)
+    temp = tempfile.mkdtemp(prefix='cultureradar-bench-')
+    os.environ.update({
+        'GUARDIAN_BASE_URL': server.start(),
+        'ARTICLE_DB_PATH': os.path.join(temp, 'articles.db'),
+        'LLM_CACHE_PATH': os.path.join(temp, 'llm_cache.db'),
+        'METRICS_DB_PATH': os.path.join(temp, 'metrics.db'),
+        'IMAGE_CACHE_DIR': os.path.join(temp, 'images'),
+        'LLM_CLIENT': 'stub',
+        'LLM_STUB_LATENCY': str(args.llm_latency),
+        'LLM_STUB_LATENCY_PER_ARTICLE': str(args.llm_latency_per_article),
+        'REFRESH_INTERVAL': '86400',
+        'CRAWL_DELAY_SECONDS': '0',
+    })
+    import logging
+    logging.disable(logging.WARNING)
+
+    import app as cultureradar
+    from werkzeug.serving import make_server
+
+    results = {'extract': bench_extract(server.pages, args.runs)}
+
+    tracemalloc.start()
+    start = perf_counter()
+    cultureradar.refresh_articles(polite=False)
+    elapsed = perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    results['ingest'] = {
+        'articles': cultureradar.article_store.count(),
+        'seconds': round(elapsed, 3),
+        'traced_peak_mb': round(peak / 2 ** 20, 2),
+    }
+
+    cultureradar.ensure_started()
+    httpd = make_server('127.0.0.1', 0, cultureradar.app, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    client = cultureradar.get_client()
+    try:
+        results['search'] = run_load(f'http://127.0.0.1:{httpd.server_port}', args, lambda: len(client.calls))
+    finally:
+        httpd.shutdown()
+        server.stop()
+    return results
+
+
+def run_load(url, args, llm_calls=None):
+    warm_keywords = [args.keywords[i % len(args.keywords)] for i in range(args.requests)]
+    phases = {'cold': args.keywords, 'burst': [args.burst_keyword] * args.clients, 'warm': warm_keywords}
+    results = {}
+    for phase, keywords in phases.items():
+        calls_before = llm_calls() if llm_calls else 0
+        results[phase] = load_test(url, keywords, args.clients, args.stream)
+        if llm_calls:
+            results[phase]['llm_calls'] = llm_calls() - calls_before
+    return results
+
+
+def git_commit():
+    root = os.path.join(os.path.dirname(__file__), '..')
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=root,
+                               capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return commit + ('-dirty' if dirty else '')
+
+
+def flatten(data, prefix=''):
+    flat = {}
+    for key, value in data.items():
+        if isinstance(value, dict):
+            flat.update(flatten(value, f'{prefix}{key}.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[f'{prefix}{key}'] = value
+    return flat
+
+
+def compare(old, new):
+    old_flat, new_flat = flatten(old['results']), flatten(new['results'])
+    print(f"{'metric':<32} {old['commit']:>14} {new['commit']:>14} {'change':>9}")
+    for key in old_flat:
+        if key not in new_flat:
+            continue
+        before, after = old_flat[key], new_flat[key]
+        change = (after - before) / before * 100 if before else 0.0
+        better = change > 0 if key.endswith(HIGHER_IS_BETTER) else change < 0
+        flag = '' if abs(change) < 5 or key.endswith(('requests', 'articles')) else (' better' if better else ' WORSE')
+        print(f"{key:<32} {before:>14} {after:>14} {change:>+8.1f}%{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=16, help='concurrent users')
+    parser.add_argument('--requests', type=int, default=400, help='searches in the warm phase')
+    parser.add_argument('--keywords', nargs='+', default=KEYWORDS)
+    parser.add_argument('--burst-keyword', default=BURST_KEYWORD, help='must not be one of --keywords')
+    parser.add_argument('--stream', action='store_true', help='load-test /search/stream instead of /search')
+    parser.add_argument('--llm-latency', type=float, default=0.2, help='seconds per stub LLM call')
+    parser.add_argument('--llm-latency-per-article', type=float, default=0.2,
+                        help='extra seconds per article in a stub LLM call')
+    parser.add_argument('--fetch-latency', type=float, default=0.0, help='seconds per fixture page')
+    parser.add_argument('--runs', type=int, default=20, help='parses per article for the extract timings')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    parser.add_argument('--target', help='load-test a server already running at this URL')
+    parser.add_argument('--out', default=RESULTS_DIR)
+    parser.add_argument('--compare', nargs='+', metavar='RESULTS.json')
+    args = parser.parse_args()
+
+    if args.compare and len(args.compare) == 2:
+        old, new = (json.load(open(path)) for path in args.compare)
+        compare(old, new)
+        return
+
+    if args.target:
+        results = {'search': run_load(args.target.rstrip('/'), args)}
+    else:
+        results = run_in_process(args)
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2 ** 20 if sys.platform == 'darwin' else 2 ** 10)
+    results['memory'] = {'peak_rss_mb': round(peak_rss, 1)}
+
+    created = datetime.now(timezone.utc)
+    report = {
+        'commit': git_commit(),
+        'created': created.isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('out', 'compare', 'fixtures')},
+        'results': results,
+    }
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"{created:%Y%m%dT%H%M%S}-{report['commit']}.json")
+    with open(path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(results, indent=2))
+    print(f"Wrote {path}")
+    if args.compare:
+        with open(args.compare[0]) as f:
+            compare(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
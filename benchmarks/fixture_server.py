@@ -0,0 +1,115 @@
+"""Serve recorded Guardian pages as a local stand-in for the live site.
+
+    python benchmarks/fixture_server.py [--port 8001] [--latency 0.05] [--fixtures DIR]
+
+then run the app with GUARDIAN_BASE_URL=http://127.0.0.1:8001. Pages come
+from ``manifest.json`` in the fixtures directory, which maps request paths
+(including any query string) to files. Responses carry an ETag and honour
+If-None-Match, so conditional revalidation behaves like it does upstream.
+The server is also the crawler's stand-in in the tests, which can add or
+change ``pages`` while it runs and make paths fail with ``fail``.
+"""
+import argparse
+import hashlib
+import json
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def load_fixtures(directory=FIXTURES_DIR):
+    with open(os.path.join(directory, 'manifest.json')) as f:
+        manifest = json.load(f)
+    pages = {}
+    for path, name in manifest.items():
+        with open(os.path.join(directory, name), 'rb') as f:
+            body = f.read()
+        pages[path] = (body, f'"{hashlib.md5(body).hexdigest()}"')
+    return pages
+
+
+class FixtureServer:
+    """Threaded HTTP server replaying fixture pages, with optional per-request latency."""
+
+    def __init__(self, directory=FIXTURES_DIR, latency=0.0, host='127.0.0.1', port=0):
+        pages = load_fixtures(directory)
+        self.hits = 0
+        self.not_modified = 0
+        # path -> statuses to answer the next requests with, in order
+        self.failures = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if latency:
+                    sleep(latency)
+                page = pages.get(self.path)
+                if page is None:
+                    self.send_response(404)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                body, etag = page
+                server.hits += 1
+                failures = server.failures.get(self.path)
+                if failures:
+                    self.send_response(failures.pop(0))
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                if self.headers.get('If-None-Match') == etag:
+                    server.not_modified += 1
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.send_header('ETag', etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.pages = pages
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.base_url = f'http://{host}:{self.httpd.server_address[1]}'
+
+    def fail(self, path, *statuses):
+        """Answer the next requests for ``path`` with these error statuses before serving it again."""
+        self.failures.setdefault(path, []).extend(statuses)
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, name='fixture-server', daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds to wait before each response')
+    parser.add_argument('--fixtures', default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    server = FixtureServer(args.fixtures, args.latency, port=args.port)
+    print(f"Serving {len(server.pages)} pages on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
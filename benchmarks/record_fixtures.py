@@ -0,0 +1,78 @@
+"""Record series index pages and their articles from the live site as benchmark fixtures.
+
+    python benchmarks/record_fixtures.py [--pages 3] [--limit N] [--out benchmarks/fixtures]
+
+Links to the Guardian are rewritten to be site-relative so the recorded pages
+can be replayed through fixture_server.py without touching the network.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+
+import lxml.html
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from crawler import Crawler
+
+GUARDIAN = 'https://www.theguardian.com'
+SERIES_PATH = '/culture/series/on-my-radar'
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def relativise(html):
+    return re.sub(r'href="https?://www\.theguardian\.com/', 'href="/', html)
+
+
+def article_paths(html):
+    root = lxml.html.document_fromstring(html)
+    paths = []
+    for href in root.xpath('//a/@href'):
+        if href.startswith(GUARDIAN):
+            href = href[len(GUARDIAN):]
+        if href.startswith('/') and 'on-my-radar' in href and href.split('?')[0] != SERIES_PATH and href not in paths:
+            paths.append(href)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=3, help='number of series pages to record')
+    parser.add_argument('--limit', type=int, help='maximum number of articles to record (default: all listed)')
+    parser.add_argument('--out', default=FIXTURES_DIR)
+    args = parser.parse_args()
+
+    crawler = Crawler()
+    os.makedirs(os.path.join(args.out, 'articles'), exist_ok=True)
+
+    manifest = {}
+    paths = []
+    for number in range(1, args.pages + 1):
+        path = SERIES_PATH if number == 1 else f'{SERIES_PATH}?page={number}'
+        series = relativise(crawler.fetch(GUARDIAN + path, polite=True).text)
+        name = 'series.html' if number == 1 else f'series-page-{number}.html'
+        with open(os.path.join(args.out, name), 'w', encoding='utf-8') as f:
+            f.write(series)
+        manifest[path] = name
+        paths += [p for p in article_paths(series) if p not in paths]
+
+    paths = paths[:args.limit]
+    for url, result in crawler.fetch_many([GUARDIAN + path for path in paths], polite=True):
+        if isinstance(result, Exception):
+            print(f"Skipping {url}: {result}")
+            continue
+        path = url[len(GUARDIAN):]
+        name = f"articles/{path.rstrip('/').rsplit('/', 1)[-1]}.html"
+        with open(os.path.join(args.out, name), 'w', encoding='utf-8') as f:
+            f.write(relativise(result.text))
+        manifest[path] = name
+
+    with open(os.path.join(args.out, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Recorded {args.pages} series pages and {len(manifest) - args.pages} articles to {args.out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+import logging
+import os
+import threading
+from concurrent.futures import FIRST_COMPLETED, wait
+from contextlib import contextmanager
+from dataclasses import dataclass
+from itertools import islice
+from time import monotonic, sleep
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import io_executor
+import metrics
+
+CRAWL_MAX_CONNECTIONS = int(os.getenv('CRAWL_MAX_CONNECTIONS', 10))
+CRAWL_PER_HOST = int(os.getenv('CRAWL_PER_HOST', 6))
+CRAWL_CONNECT_TIMEOUT = float(os.getenv('CRAWL_CONNECT_TIMEOUT', 5))
+CRAWL_READ_TIMEOUT = float(os.getenv('CRAWL_READ_TIMEOUT', 15))
+CRAWL_RETRIES = int(os.getenv('CRAWL_RETRIES', 3))
+CRAWL_BACKOFF = float(os.getenv('CRAWL_BACKOFF', 0.5))
+CRAWL_DELAY_SECONDS = float(os.getenv('CRAWL_DELAY_SECONDS', 1.0))
+
+USER_AGENT = 'CultureRadar/1.0 (+https://github.com/Lizzie222222/cultureradar)'
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(slots=True)
+class FetchResult:
+    url: str
+    status: int
+    text: str | None
+    etag: str | None
+    last_modified: str | None
+
+    @property
+    def not_modified(self):
+        return self.status == 304
+
+
+class Crawler:
+    """Keep-alive HTTP fetcher shared by everything that talks to the Guardian.
+
+    One pooled requests.Session is reused for every fetch so connections (and
+    TLS sessions) survive between requests. Each request has connect/read
+    timeouts, failed or throttled responses are retried with exponential
+    backoff, at most ``per_host`` requests run against a single host at once,
+    and callers can pass stored validators to make the GET conditional.
+    ``polite`` fetches (background crawling) additionally start no closer than
+    ``delay`` seconds apart per host.
+    """
+
+    def __init__(self, max_connections=CRAWL_MAX_CONNECTIONS, per_host=CRAWL_PER_HOST,
+                 connect_timeout=CRAWL_CONNECT_TIMEOUT, read_timeout=CRAWL_READ_TIMEOUT,
+                 retries=CRAWL_RETRIES, backoff=CRAWL_BACKOFF, delay=CRAWL_DELAY_SECONDS):
+        self.max_connections = max_connections
+        self.per_host = per_host
+        self.timeout = (connect_timeout, read_timeout)
+        self.delay = delay
+
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=('GET',), respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=max_connections, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers['User-Agent'] = USER_AGENT
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._host_slots = {}
+        self._host_slots_lock = threading.Lock()
+        self._next_start = {}
+        self._next_start_lock = threading.Lock()
+
+    def _wait_turn(self, url):
+        host = urlparse(url).netloc
+        # Hand out start times delay apart, so concurrent fetches queue up politely
+        with self._next_start_lock:
+            now = monotonic()
+            start = max(now, self._next_start.get(host, now))
+            self._next_start[host] = start + self.delay
+        if start > now:
+            sleep(start - now)
+
+    @contextmanager
+    def _host_slot(self, url):
+        host = urlparse(url).netloc
+        with self._host_slots_lock:
+            slot = self._host_slots.get(host)
+            if slot is None:
+                slot = self._host_slots[host] = threading.BoundedSemaphore(self.per_host)
+        with slot:
+            yield
+
+    def fetch(self, url, etag=None, last_modified=None, stage='fetch', polite=False):
+        if polite and self.delay:
+            self._wait_turn(url)
+        headers = {}
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        with self._host_slot(url), metrics.timer(stage):
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+
+        if response.status_code == 304:
+            return FetchResult(url, 304, None, etag, last_modified)
+        response.raise_for_status()
+        return FetchResult(url, response.status_code, response.text,
+                           response.headers.get('ETag'), response.headers.get('Last-Modified'))
+
+    def fetch_many(self, urls, validators=None, polite=False):
+        """Fetch ``urls`` concurrently, yielding ``(url, FetchResult or exception)`` as each finishes.
+
+        Fetches run on the shared I/O pool, at most ``max_connections`` at a
+        time so a long crawl never takes over the pool. Polite fetches wait
+        for their turn here, before being submitted, so no pool thread sleeps.
+        """
+        validators = validators or {}
+        urls = iter(urls)
+        future_to_url = {}
+
+        def submit(url):
+            if polite and self.delay:
+                self._wait_turn(url)
+            future = io_executor.submit(self.fetch, url, *validators.get(url, (None, None)),
+                                        stage='article_fetch')
+            future_to_url[future] = url
+
+        for url in islice(urls, self.max_connections):
+            submit(url)
+        while future_to_url:
+            done, _ = wait(future_to_url, return_when=FIRST_COMPLETED)
+            for future in done:
+                url = future_to_url.pop(future)
+                next_url = next(urls, None)
+                if next_url is not None:
+                    submit(next_url)
+                try:
+                    yield url, future.result()
+                except Exception as e:
+                    yield url, e
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,184 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import lxml.etree
+import lxml.html
+
+import metrics
+
+EXTRACT_CACHE_SIZE = int(os.getenv('EXTRACT_CACHE_SIZE', 512))
+
+LINK_NAMES = ('in body link', 'auto-linked-tag')
+GUARDIAN_PREFIXES = ('https://www.theguardian.com', 'http://www.theguardian.com', '/')
+RECOMMENDATION_WORDS = ('recommends', 'recommendation', 'suggests', 'favourite', 'favorite', 'pick')
+
+_parser = lxml.html.HTMLParser(encoding='utf-8')
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+@dataclass(slots=True)
+class ArticleRecord:
+    title: str
+    image: str
+    recommended_by: str
+    recommender_info: str
+    description: str | None
+    paragraphs: list = field(default_factory=list)
+    external_links: dict = field(default_factory=dict)
+
+
+def _has_class(element, name):
+    return name in (element.get('class') or '').split()
+
+
+def _normalise_image(image):
+    if isinstance(image, list):
+        image = image[0] if image else None
+    if isinstance(image, dict):
+        image = image.get('url')
+    if isinstance(image, str) and not image.startswith('http'):
+        image = f"https:{image}"
+    return image
+
+
+def _ld_json_image(script_text):
+    try:
+        data = json.loads(script_text)
+    except (json.JSONDecodeError, TypeError):
+        return None
+    if isinstance(data, list):
+        for item in data:
+            if isinstance(item, dict) and 'image' in item:
+                return _normalise_image(item['image'])
+    elif isinstance(data, dict):
+        return _normalise_image(data.get('image'))
+    return None
+
+
+def _parse(html):
+    title = None
+    main_image = ld_json = og_image = body_image = description = None
+    paragraphs = []
+    # (text, [(anchor text, href)], inside the article body)
+    paragraph_links = []
+    body_links = []
+
+    body_depth = main_depth = None
+    depth = 0
+    current_links = None
+
+    root = lxml.html.document_fromstring(html.encode('utf-8'), parser=_parser)
+    for event, element in lxml.etree.iterwalk(root, events=('start', 'end')):
+        tag = element.tag
+        if not isinstance(tag, str):
+            continue
+        if event == 'end':
+            depth -= 1
+            if depth == body_depth:
+                body_depth = None
+            if depth == main_depth:
+                main_depth = None
+            if tag == 'p':
+                text = element.text_content()
+                paragraphs.append(text)
+                paragraph_links.append((text, current_links, body_depth is not None))
+                current_links = None
+            continue
+
+        depth += 1
+        if tag == 'div':
+            if body_depth is None and _has_class(element, 'content__article-body'):
+                body_depth = depth - 1
+            if main_depth is None and _has_class(element, 'content__main-column'):
+                main_depth = depth - 1
+        elif tag == 'p':
+            current_links = []
+        elif tag == 'a':
+            href = element.get('href')
+            if href is None:
+                continue
+            if current_links is not None:
+                current_links.append((element.text_content().strip(), href))
+            if body_depth is not None and element.get('data-link-name') in LINK_NAMES:
+                body_links.append((element.text_content().strip(), href))
+        elif tag == 'h1':
+            if title is None:
+                title = element.text_content().strip()
+        elif tag == 'img':
+            if main_image is None and main_depth is not None and _has_class(element, 'immersive-main-media__media'):
+                main_image = element.get('src')
+            if body_image is None and body_depth is not None:
+                body_image = element.get('src')
+        elif tag == 'meta':
+            prop = element.get('property')
+            if prop == 'og:image' and og_image is None:
+                og_image = element.get('content')
+            elif prop == 'og:description' and description is None:
+                description = element.get('content')
+        elif tag == 'script':
+            if ld_json is None and element.get('type') == 'application/ld+json':
+                ld_json = element.text
+
+    image = main_image or (ld_json and _ld_json_image(ld_json)) or og_image or body_image
+    image = _normalise_image(image)
+
+    recommended_by = "Unknown"
+    if title and "On my radar:" in title:
+        recommended_by = title.split("On my radar:")[1].split("'s cultural highlights")[0].strip()
+
+    recommender_info = next((p.strip() for p in paragraphs if 'is a' in p or 'was a' in p),
+                            "No additional information available about the recommender.")
+
+    # Same precedence as the Guardian markup has always needed: explicitly tagged
+    # body links, then links in paragraphs that read like a recommendation, then
+    # links in "Category: thing" paragraphs.
+    external_links = {}
+    for text, href in body_links:
+        if not href.startswith(GUARDIAN_PREFIXES):
+            external_links[text] = href
+    body_paragraphs = [(text, links) for text, links, in_body in paragraph_links if in_body]
+    for text, links in body_paragraphs:
+        if any(word in text.lower() for word in RECOMMENDATION_WORDS):
+            for link_text, href in links:
+                if not href.startswith(GUARDIAN_PREFIXES):
+                    external_links[link_text] = href
+    for text, links in body_paragraphs:
+        if ':' in text:
+            for link_text, href in links:
+                if not href.startswith(GUARDIAN_PREFIXES):
+                    external_links[link_text] = href
+
+    return ArticleRecord(
+        title=title or "Untitled",
+        image=image or '/static/placeholder.jpg',
+        recommended_by=recommended_by,
+        recommender_info=recommender_info,
+        description=description,
+        paragraphs=paragraphs,
+        external_links=external_links,
+    )
+
+
+def extract_article(html):
+    """Parse an article page in a single walk, caching records by content hash."""
+    key = hashlib.blake2b(html.encode('utf-8'), digest_size=16).digest()
+    with _cache_lock:
+        record = _cache.get(key)
+        if record is not None:
+            _cache.move_to_end(key)
+    if record is not None:
+        metrics.inc('cache_requests_total', cache='extract', result='hit')
+        return record
+
+    metrics.inc('cache_requests_total', cache='extract', result='miss')
+    record = _parse(html)
+    with _cache_lock:
+        _cache[key] = record
+        while len(_cache) > EXTRACT_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return record
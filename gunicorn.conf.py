@@ -0,0 +1,25 @@
+"""gunicorn settings, picked up automatically by ``gunicorn wsgi:app``.
+
+Each worker process has its own search index, extract cache and I/O pool,
+and shares the SQLite article store, LLM cache, metrics totals and image
+cache on disk. Only the worker holding the refresher lease crawls; the rest
+index what it stores.
+Don't enable preload_app: the app opens SQLite connections and starts
+threads, neither of which survives a fork.
+"""
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = os.getenv('WEB_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_WORKERS', max(2, multiprocessing.cpu_count())))
+# Requests mostly wait on the LLM, so serve them from threads
+worker_class = 'gthread'
+threads = int(os.getenv('WEB_THREADS', 16))
+# Long enough for a cold search's LLM requests
+timeout = int(os.getenv('WEB_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
@@ -0,0 +1,215 @@
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from io import BytesIO
+from urllib.parse import urljoin, urlparse
+
+try:
+    # In requirements.txt, but without it thumbnails are skipped and the original is served
+    from PIL import Image
+except ImportError:
+    Image = None
+
+from singleflight import SingleFlight
+
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', 'image_cache')
+IMAGE_CACHE_MAX_BYTES = int(os.getenv('IMAGE_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+IMAGE_MAX_BYTES = int(os.getenv('IMAGE_MAX_BYTES', 10 * 1024 * 1024))
+IMAGE_PROXY_ALLOWED_HOSTS = os.getenv('IMAGE_PROXY_ALLOWED_HOSTS',
+                                      'i.guim.co.uk,media.guim.co.uk,uploads.guim.co.uk,static.guim.co.uk')
+THUMBNAIL_WIDTHS = (320, 640, 960, 1280)
+
+CHUNK_SIZE = 64 * 1024
+MAX_REDIRECTS = 5
+
+logger = logging.getLogger(__name__)
+
+
+class ImageTooLarge(ValueError):
+    """The image is bigger than IMAGE_MAX_BYTES, so it isn't cached."""
+
+
+class ImageCache:
+    """Size-bounded on-disk cache of proxied images and their thumbnails.
+
+    Images are treated as immutable per URL (Guardian image URLs are versioned
+    and signed), so an entry's key doubles as a strong ETag and never needs
+    revalidating. Files are evicted least recently used once the cache grows
+    past ``max_bytes``. Concurrent misses for the same image and width share
+    one download and resize.
+    """
+
+    def __init__(self, session, timeout, directory=IMAGE_CACHE_DIR, max_bytes=IMAGE_CACHE_MAX_BYTES,
+                 allowed_hosts=IMAGE_PROXY_ALLOWED_HOSTS):
+        self.session = session
+        self.timeout = timeout
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.allowed_hosts = {host.strip().lower() for host in allowed_hosts.split(',') if host.strip()}
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        os.makedirs(directory, exist_ok=True)
+        if Image is None:
+            logger.warning("Pillow isn't installed; serving original images instead of thumbnails")
+        self._size = sum(size for _, size, _ in self._entries())
+
+    def is_allowed(self, url):
+        parsed = urlparse(url)
+        return parsed.scheme in ('http', 'https') and (parsed.hostname or '').lower() in self.allowed_hosts
+
+    @staticmethod
+    def snap_width(width):
+        """Round a requested width up to one of the fixed thumbnail sizes (None for the original)."""
+        if not width or Image is None:
+            return None
+        return next((w for w in THUMBNAIL_WIDTHS if w >= width), None)
+
+    @staticmethod
+    def key(url, width=None):
+        return hashlib.sha256(f'{url}|{width or ""}'.encode('utf-8')).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.json') or name.startswith('.'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def get(self, key):
+        """Return ``(path, content type)`` for a cached image, or None."""
+        path = self._path(key)
+        try:
+            with open(path + '.json') as f:
+                content_type = json.load(f)['content_type']
+            # mtime is the LRU clock
+            os.utime(path)
+        except (FileNotFoundError, ValueError, KeyError):
+            return None
+        return path, content_type
+
+    def _store(self, key, temp_path, content_type):
+        path = self._path(key)
+        with open(path + '.json', 'w') as f:
+            json.dump({'content_type': content_type}, f)
+        with self._lock:
+            # Replacing an entry only adds the difference
+            try:
+                replaced = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced = 0
+            os.replace(temp_path, path)
+            self._size += os.path.getsize(path) - replaced
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        self._size = sum(size for _, size, _ in entries)
+        # Trim to 90% so we're not evicting on every write
+        for path, size, _ in entries:
+            if self._size <= self.max_bytes * 0.9:
+                break
+            for victim in (path, path + '.json'):
+                try:
+                    os.remove(victim)
+                except FileNotFoundError:
+                    pass
+            self._size -= size
+
+    def _temp_file(self, key):
+        os.makedirs(os.path.dirname(self._path(key)), exist_ok=True)
+        return tempfile.NamedTemporaryFile(dir=os.path.dirname(self._path(key)), prefix='.', delete=False)
+
+    def _open_upstream(self, url):
+        # Follow redirects by hand so every hop is held to the host allowlist
+        for _ in range(MAX_REDIRECTS + 1):
+            response = self.session.get(url, stream=True, timeout=self.timeout, allow_redirects=False)
+            if not response.is_redirect:
+                break
+            response.close()
+            url = urljoin(url, response.headers['Location'])
+            if not self.is_allowed(url):
+                raise ValueError(f"Redirected to a host that isn't allowed: {url}")
+        else:
+            raise ValueError(f"Too many redirects for {url}")
+        response.raise_for_status()
+        content_type = response.headers.get('Content-Type', 'image/jpeg')
+        if not content_type.startswith('image/'):
+            response.close()
+            raise ValueError(f"Not an image: {content_type}")
+        return response, content_type
+
+    def original(self, url):
+        """Return ``(path, content type)`` of ``url``, downloading it into the cache on a miss.
+
+        Raises ImageTooLarge for images over IMAGE_MAX_BYTES, which ``stream``
+        can pass through instead.
+        """
+        key = self.key(url)
+        return self.get(key) or self._flight.do(key, lambda: self._download(url, key))[0]
+
+    def _download(self, url, key):
+        # Another caller may have stored it between our lookup and getting here
+        cached = self.get(key)
+        if cached:
+            return cached
+        response, content_type = self._open_upstream(url)
+        size = 0
+        with response, self._temp_file(key) as temp:
+            try:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    size += len(chunk)
+                    if size > IMAGE_MAX_BYTES:
+                        raise ImageTooLarge(f"Image too large to cache: over {IMAGE_MAX_BYTES} bytes")
+                    temp.write(chunk)
+            except BaseException:
+                temp.close()
+                os.remove(temp.name)
+                raise
+        self._store(key, temp.name, content_type)
+        return self._path(key), content_type
+
+    def stream(self, url):
+        """Fetch ``url`` without caching it and return ``(content type, chunks)``."""
+        response, content_type = self._open_upstream(url)
+
+        def chunks():
+            with response:
+                yield from response.iter_content(CHUNK_SIZE)
+
+        return content_type, chunks()
+
+    def thumbnail(self, url, width):
+        """Return ``(path, content type)`` of ``url`` scaled down to ``width`` pixels wide."""
+        key = self.key(url, width)
+        return self.get(key) or self._flight.do(key, lambda: self._resize(url, width, key))[0]
+
+    def _resize(self, url, width, key):
+        cached = self.get(key)
+        if cached:
+            return cached
+        with open(self.original(url)[0], 'rb') as f:
+            image = Image.open(BytesIO(f.read()))
+        if image.width > width:
+            image.thumbnail((width, round(image.height * width / image.width)))
+        if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+            image_format, content_type = 'PNG', 'image/png'
+        else:
+            image_format, content_type = 'JPEG', 'image/jpeg'
+            image = image.convert('RGB')
+
+        with self._temp_file(key) as temp:
+            image.save(temp, image_format, **({'quality': 85, 'optimize': True} if image_format == 'JPEG' else {}))
+        self._store(key, temp.name, content_type)
+        return self._path(key), content_type
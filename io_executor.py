@@ -0,0 +1,19 @@
+import contextvars
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+IO_MAX_WORKERS = int(os.getenv('IO_MAX_WORKERS', 32))
+
+# One pool per process for every outbound call (Guardian fetches, LLM requests),
+# so concurrent searches queue for a fixed number of threads instead of each
+# starting their own
+_executor = ThreadPoolExecutor(max_workers=IO_MAX_WORKERS, thread_name_prefix='io')
+
+
+def submit(fn, *args, **kwargs):
+    """Run ``fn`` on the shared pool in a copy of the caller's context.
+
+    The copied context carries the caller's per-request timings. Tasks must
+    not wait on other tasks they submit themselves, or a full pool deadlocks.
+    """
+    return _executor.submit(contextvars.copy_context().run, fn, *args, **kwargs)
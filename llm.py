@@ -0,0 +1,99 @@
+import json
+import os
+import re
+import threading
+from time import sleep
+
+import openai
+
+import metrics
+
+LLM_MODEL = os.getenv('LLM_MODEL', 'gpt-4o-mini')
+LLM_CLIENT = os.getenv('LLM_CLIENT', 'openai')
+LLM_STUB_LATENCY = float(os.getenv('LLM_STUB_LATENCY', 0))
+LLM_STUB_LATENCY_PER_ARTICLE = float(os.getenv('LLM_STUB_LATENCY_PER_ARTICLE', 0))
+
+
+class OpenAIChatClient:
+    def complete(self, messages, model=LLM_MODEL, max_tokens=400):
+        response = openai.ChatCompletion.create(model=model, messages=messages, max_tokens=max_tokens)
+        usage = getattr(response, 'usage', None)
+        if usage:
+            metrics.inc('openai_tokens_total', usage.get('prompt_tokens', 0), kind='prompt')
+            metrics.inc('openai_tokens_total', usage.get('completion_tokens', 0), kind='completion')
+        return response.choices[0].message.content.strip()
+
+
+class StubChatClient:
+    """Offline stand-in for OpenAIChatClient.
+
+    ``responder`` is called with the chat messages and returns the reply text.
+    To mimic a real API call, which writes one answer after another, it first
+    sleeps ``latency`` seconds plus ``latency_per_article`` for every article
+    in the prompt. Every request is recorded in ``calls``.
+    """
+
+    def __init__(self, responder, latency=0.0, latency_per_article=0.0):
+        self.responder = responder
+        self.latency = latency
+        self.latency_per_article = latency_per_article
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def complete(self, messages, model=LLM_MODEL, max_tokens=400):
+        with self._lock:
+            self.calls.append(messages)
+        delay = self.latency + self.latency_per_article * len(prompt_articles(messages[-1]['content']))
+        if delay:
+            sleep(delay)
+        return self.responder(messages)
+
+
+def prompt_articles(prompt):
+    """Split a formatting prompt into its articles (the whole prompt for a single-article one)."""
+    return re.split(r'\n\s*Article \d+:\n', prompt)[1:] or [prompt]
+
+
+def fake_reply(messages):
+    """Deterministic answer to the formatting prompts, built from the prompt itself.
+
+    Batch prompts get a JSON array with one item per article, single-article
+    prompts the line-based format. The first external link of each article is
+    taken as the recommendation so links resolve like they would for real.
+    """
+    prompt = messages[-1]['content']
+    items = []
+    for article in prompt_articles(prompt):
+        title = re.search(r'Title: (.*)', article)
+        link = re.search(r'External Links:\n\s*(.+?): ', article)
+        snippet = re.search(r'Snippet: (.*)', article)
+        name = title.group(1).strip() if title else 'Unknown'
+        if 'On my radar:' in name:
+            name = name.split('On my radar:')[1].split("'s cultural highlights")[0].strip()
+        items.append({
+            'recommendation': link.group(1).strip() if link else 'Untitled',
+            'recommended_by': name,
+            'recommender_info': f'{name} is a regular contributor.',
+            'snippet': snippet.group(1).strip()[:300] if snippet and snippet.group(1).strip() else 'No details.',
+        })
+    if 'JSON array' in prompt:
+        return json.dumps(items)
+    item = items[0]
+    return (f"Recommendation: {item['recommendation']}\nRecommended by: {item['recommended_by']}\n"
+            f"Recommender info: {item['recommender_info']}\nSnippet: {item['snippet']}")
+
+
+if LLM_CLIENT == 'stub':
+    _client = StubChatClient(fake_reply, LLM_STUB_LATENCY, LLM_STUB_LATENCY_PER_ARTICLE)
+else:
+    _client = OpenAIChatClient()
+
+
+def get_client():
+    return _client
+
+
+def set_client(client):
+    """Swap the chat client, e.g. for a StubChatClient in tests or benchmarks."""
+    global _client
+    _client = client
@@ -0,0 +1,165 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from time import time
+
+import metrics
+from singleflight import SingleFlight
+
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', 'llm_cache.db')
+LLM_CACHE_TTL = int(os.getenv('LLM_CACHE_TTL', 7 * 24 * 3600))
+LLM_CACHE_SIZE = int(os.getenv('LLM_CACHE_SIZE', 5000))
+# last_used is only rewritten when it's older than this, so hits rarely need the write lock
+TOUCH_INTERVAL = 60
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value TEXT,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+"""
+
+STAT_RESULTS = {'hits': 'hit', 'misses': 'miss', 'coalesced': 'coalesced'}
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(*parts):
+    """Stable hash of the JSON-serialisable inputs that determine a response."""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Persistent TTL/LRU cache for LLM results with single-flight computation.
+
+    Values are JSON (``None`` included, so "nothing relevant here" answers are
+    cached too). Entries older than ``ttl`` seconds are ignored and purged, and
+    once there are more than ``max_entries`` the least recently used go first.
+    Concurrent misses for the same key share a single computation.
+    """
+
+    def __init__(self, path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_entries=LLM_CACHE_SIZE):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._flight = SingleFlight()
+        self._stats_lock = threading.Lock()
+        self.hits = self.misses = self.coalesced = 0
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _count(self, stat):
+        with self._stats_lock:
+            setattr(self, stat, getattr(self, stat) + 1)
+        metrics.inc('cache_requests_total', cache='llm', result=STAT_RESULTS[stat])
+
+    def stats(self):
+        with self._stats_lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'hit_rate': (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            }
+
+    def get(self, key):
+        """Return ``(found, value)``."""
+        found = self._lookup([key])
+        if key not in found:
+            return False, None
+        return True, found[key]
+
+    def _lookup(self, keys):
+        now = time()
+        conn = self._conn()
+        rows = conn.execute(
+            f"SELECT key, value, last_used FROM responses WHERE key IN ({', '.join('?' * len(keys))}) "
+            "AND created_at >= ?", (*keys, now - self.ttl)
+        ).fetchall()
+        stale = [(now, key) for key, _, last_used in rows if last_used < now - TOUCH_INTERVAL]
+        if stale:
+            with conn:
+                conn.executemany('UPDATE responses SET last_used = ? WHERE key = ?', stale)
+        return {key: json.loads(value) for key, value, _ in rows}
+
+    def put(self, key, value):
+        now = time()
+        with self._conn() as conn:
+            conn.execute('INSERT OR REPLACE INTO responses (key, value, created_at, last_used) VALUES (?, ?, ?, ?)',
+                         (key, json.dumps(value), now, now))
+            conn.execute('DELETE FROM responses WHERE created_at < ?', (now - self.ttl,))
+            conn.execute('DELETE FROM responses WHERE key IN '
+                         '(SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)',
+                         (self.max_entries,))
+
+    def get_many(self, keys):
+        """Return ``{key: value}`` for the keys that are cached, counting them as hits."""
+        keys = list(keys)
+        found = self._lookup(keys) if keys else {}
+        for _ in found:
+            self._count('hits')
+        return found
+
+    def compute_many(self, keys, compute):
+        """Compute and cache several values with one call: ``compute(keys)`` returns them in order.
+
+        Identical concurrent batches share a single call. Nothing is cached if
+        ``compute`` raises.
+        """
+        keys = tuple(keys)
+
+        def compute_and_store():
+            # An identical batch may have finished between our lookup and getting here
+            found = self._lookup(keys)
+            if len(found) == len(keys):
+                return found, False
+            values = compute(keys)
+            for key, value in zip(keys, values):
+                self.put(key, value)
+            return dict(zip(keys, values)), True
+
+        (values, computed), shared = self._flight.do(keys, compute_and_store)
+        for _ in keys:
+            self._count('coalesced' if shared else 'misses' if computed else 'hits')
+        return values
+
+    def get_or_compute(self, key, compute):
+        """Return the cached value for ``key``, calling ``compute()`` once on a miss.
+
+        Exceptions from ``compute`` propagate to every waiting caller and
+        nothing is cached.
+        """
+        found, value = self.get(key)
+        if found:
+            self._count('hits')
+            return value
+
+        def compute_and_store():
+            # Another caller may have stored it between our lookup and getting here
+            found, value = self.get(key)
+            if found:
+                return value
+            value = compute()
+            self.put(key, value)
+            return value
+
+        value, shared = self._flight.do(key, compute_and_store)
+        self._count('coalesced' if shared else 'misses')
+        return value
@@ -0,0 +1,322 @@
+"""Lightweight in-process metrics with Prometheus text exposition.
+
+Counters and histograms are keyed by name plus labels. Setting
+``METRICS_ENABLED=false`` turns ``inc``/``observe`` into early returns and
+``timer`` into a shared no-op timer, unless a per-request breakdown has been
+asked for with ``track_request``. ``MetricsStore`` adds up the metrics of
+every process sharing a database, e.g. gunicorn workers.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import sqlite3
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from time import perf_counter, sleep
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+METRICS_DB_PATH = os.getenv('METRICS_DB_PATH', 'metrics.db')
+METRICS_PUBLISH_INTERVAL = float(os.getenv('METRICS_PUBLISH_INTERVAL', 5))
+PREFIX = 'cultureradar_'
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+HELP = {
+    'stage_seconds': ('histogram', 'Time spent in each stage of crawling and searching'),
+    'search_seconds': ('histogram', 'End-to-end /search latency'),
+    'searches_coalesced_total': ('counter', 'Searches answered by an identical search already in flight'),
+    'articles_total': ('counter', 'Articles by crawl outcome (fetched, not_modified, failed, stored)'),
+    'search_articles_total': ('counter', 'Articles per search by outcome (matched, returned, dropped)'),
+    'cache_requests_total': ('counter', 'Cache lookups by cache and result'),
+    'openai_requests_total': ('counter', 'OpenAI API requests by outcome'),
+    'openai_tokens_total': ('counter', 'OpenAI tokens used, by kind'),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS metrics (
+    name TEXT NOT NULL,
+    labels TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (name, labels)
+);
+"""
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def inc(name, amount=1, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, value, **labels):
+    if not METRICS_ENABLED:
+        return
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            # bucket counts, then sum and count
+            histogram = _histograms[key] = [0] * len(BUCKETS) + [0.0, 0]
+        index = bisect_left(BUCKETS, value)
+        if index < len(BUCKETS):
+            histogram[index] += 1
+        histogram[-2] += value
+        histogram[-1] += 1
+
+
+class RequestTimings:
+    """Per-request breakdown: time and number of calls per stage, plus counts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.counts = {}
+
+    def add(self, stage, seconds):
+        with self._lock:
+            total, calls = self.stages.get(stage, (0.0, 0))
+            self.stages[stage] = (total + seconds, calls + 1)
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + amount
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'stages': {stage: {'ms': round(total * 1000, 2), 'calls': calls}
+                           for stage, (total, calls) in self.stages.items()},
+                'counts': dict(self.counts),
+            }
+
+
+class _Timer:
+    __slots__ = ('stage', 'timings', 'start')
+
+    def __init__(self, stage, timings):
+        self.stage = stage
+        self.timings = timings
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = perf_counter() - self.start
+        observe('stage_seconds', elapsed, stage=self.stage)
+        if self.timings is not None:
+            self.timings.add(self.stage, elapsed)
+
+    @contextmanager
+    def paused(self):
+        """Stop the clock inside the block, e.g. while a generator is suspended at a ``yield``."""
+        paused_at = perf_counter()
+        try:
+            yield
+        finally:
+            self.start += perf_counter() - paused_at
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+    def paused(self):
+        return nullcontext()
+
+
+_null_timer = _NullTimer()
+
+
+def timer(stage):
+    timings = _request_timings.get()
+    if not METRICS_ENABLED and timings is None:
+        return _null_timer
+    return _Timer(stage, timings)
+
+
+def count_for_request(name, amount=1):
+    """Add to a count in the current request's breakdown, if one is being tracked."""
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.count(name, amount)
+
+
+@contextmanager
+def track_request():
+    """Collect a RequestTimings breakdown for everything timed inside the block.
+
+    Work handed to other threads only contributes if it runs inside a copy of
+    the caller's context (``contextvars.copy_context().run``).
+    """
+    timings = RequestTimings()
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in pairs) + '}'
+
+
+def _snapshot():
+    with _lock:
+        return dict(_counters), {key: list(value) for key, value in _histograms.items()}
+
+
+def render():
+    """Return this process's metrics in the Prometheus text exposition format."""
+    return _render(*_snapshot())
+
+
+def _render(counters, histograms):
+    lines = []
+    described = set()
+
+    def describe(name):
+        if name not in described:
+            described.add(name)
+            kind, text = HELP.get(name, ('untyped', name))
+            lines.append(f'# HELP {PREFIX}{name} {text}')
+            lines.append(f'# TYPE {PREFIX}{name} {kind}')
+
+    for (name, labels), value in sorted(counters.items()):
+        describe(name)
+        lines.append(f'{PREFIX}{name}{_format_labels(labels)} {value}')
+
+    for (name, labels), histogram in sorted(histograms.items()):
+        describe(name)
+        cumulative = 0
+        for bound, bucket in zip(BUCKETS, histogram):
+            cumulative += bucket
+            lines.append(f'{PREFIX}{name}_bucket{_format_labels(labels, [("le", bound)])} {cumulative}')
+        lines.append(f'{PREFIX}{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {histogram[-1]}')
+        lines.append(f'{PREFIX}{name}_sum{_format_labels(labels)} {histogram[-2]}')
+        lines.append(f'{PREFIX}{name}_count{_format_labels(labels)} {histogram[-1]}')
+
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsStore:
+    """Metric totals shared by every process using one SQLite database.
+
+    Under gunicorn each worker counts on its own, and a scrape is answered by
+    whichever worker gets it. To keep the exposed counters monotonic, each
+    process adds what it has counted since its last publish to shared
+    totals. It publishes every ``interval`` seconds once started, on exit,
+    and before rendering. Totals carry on across worker restarts; a worker
+    that dies without exiting cleanly loses at most ``interval`` seconds of
+    counts.
+    """
+
+    def __init__(self, path=METRICS_DB_PATH, interval=METRICS_PUBLISH_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._local = threading.local()
+        self._publish_lock = threading.Lock()
+        # What this process has already added to the totals
+        self._published = ({}, {})
+        self._thread = None
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # Autocommit, so publish can take the write lock up front with BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def start(self):
+        """Publish in the background from now on, and once more when the process exits."""
+        if not METRICS_ENABLED or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name='metrics-publisher', daemon=True)
+        self._thread.start()
+        atexit.register(self.publish)
+
+    def _run(self):
+        while True:
+            sleep(self.interval)
+            try:
+                self.publish()
+            except Exception:
+                logger.exception("Error publishing metrics")
+
+    def publish(self):
+        """Add what this process has counted since it last published to the shared totals."""
+        with self._publish_lock:
+            counters, histograms = _snapshot()
+            published_counters, published_histograms = self._published
+            deltas = []
+            for key, value in counters.items():
+                delta = value - published_counters.get(key, 0)
+                if delta:
+                    deltas.append((key, delta))
+            for key, values in histograms.items():
+                before = published_histograms.get(key)
+                delta = [value - previous for value, previous in zip(values, before)] if before else values
+                # The last slot is the observation count
+                if delta[-1]:
+                    deltas.append((key, delta))
+
+            if deltas:
+                conn = self._conn()
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    for (name, labels), delta in deltas:
+                        labels = json.dumps(labels)
+                        row = conn.execute('SELECT value FROM metrics WHERE name = ? AND labels = ?',
+                                           (name, labels)).fetchone()
+                        if row is not None:
+                            total = json.loads(row[0])
+                            delta = ([a + b for a, b in zip(total, delta)] if isinstance(delta, list)
+                                     else total + delta)
+                        conn.execute('INSERT OR REPLACE INTO metrics (name, labels, value) VALUES (?, ?, ?)',
+                                     (name, labels, json.dumps(delta)))
+                    conn.execute('COMMIT')
+                except BaseException:
+                    conn.execute('ROLLBACK')
+                    raise
+            self._published = (counters, histograms)
+
+    def render(self):
+        """Return the totals of every process in the Prometheus text exposition format."""
+        self.publish()
+        counters = {}
+        histograms = {}
+        for name, labels, value in self._conn().execute('SELECT name, labels, value FROM metrics'):
+            key = (name, tuple(tuple(pair) for pair in json.loads(labels)))
+            value = json.loads(value)
+            if isinstance(value, list):
+                histograms[key] = value
+            else:
+                counters[key] = value
+        return _render(counters, histograms)
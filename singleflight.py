@@ -0,0 +1,51 @@
+import threading
+from concurrent.futures import Future
+
+
+class SingleFlight:
+    """Collapse concurrent calls for the same key into one execution.
+
+    The first caller for a key runs the function; anyone asking for the same key
+    while it's still running waits for that result (or exception) instead of
+    starting a duplicate call.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def begin(self, key):
+        """Return ``(future, leader)`` for work that finishes somewhere else, e.g. on a pool thread.
+
+        Only the leader does the work, and it must end it with ``settle``;
+        everyone else waits on the future.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            if future is not None:
+                return future, False
+            future = self._calls[key] = Future()
+            return future, True
+
+    def settle(self, key, result=None, exception=None):
+        """Finish the call for ``key``, handing ``result`` (or ``exception``) to everyone waiting."""
+        with self._lock:
+            future = self._calls.pop(key)
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def do(self, key, fn):
+        """Return ``(result, shared)``; ``shared`` is True if another caller did the work."""
+        future, leader = self.begin(key)
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn()
+        except BaseException as e:
+            self.settle(key, exception=e)
+            raise
+        self.settle(key, result)
+        return result, False
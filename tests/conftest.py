@@ -0,0 +1,32 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+# The app and its stores read their settings on import, so keep them away
+# from the real databases and the OpenAI API before anything imports them
+SCRATCH = tempfile.mkdtemp(prefix='cultureradar-tests-')
+os.environ.update({
+    'ARTICLE_DB_PATH': os.path.join(SCRATCH, 'articles.db'),
+    'LLM_CACHE_PATH': os.path.join(SCRATCH, 'llm_cache.db'),
+    'METRICS_DB_PATH': os.path.join(SCRATCH, 'metrics.db'),
+    'IMAGE_CACHE_DIR': os.path.join(SCRATCH, 'images'),
+    'LLM_CLIENT': 'stub',
+    'REFRESH_INTERVAL': '86400',
+})
+
+from fixture_server import FixtureServer  # noqa: E402
+
+
+@pytest.fixture
+def site():
+    """Local stand-in for the Guardian serving the recorded fixture pages."""
+    server = FixtureServer()
+    server.start()
+    yield server
+    server.stop()
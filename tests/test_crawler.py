@@ -0,0 +1,66 @@
+import pytest
+import requests
+
+from crawler import Crawler, FetchResult
+
+SERIES_PATH = '/culture/series/on-my-radar'
+
+
+def test_conditional_get_returns_not_modified(site):
+    crawler = Crawler(delay=0)
+    url = site.base_url + SERIES_PATH
+
+    first = crawler.fetch(url)
+    assert first.status == 200
+    assert first.etag and first.text
+
+    second = crawler.fetch(url, first.etag)
+    assert second.not_modified
+    assert second.text is None
+    assert second.etag == first.etag
+    assert site.not_modified == 1
+
+
+def test_changed_page_is_fetched_again(site):
+    crawler = Crawler(delay=0)
+    url = site.base_url + SERIES_PATH
+    first = crawler.fetch(url)
+
+    body, _ = site.pages[SERIES_PATH]
+    site.pages[SERIES_PATH] = (body + b'<!-- updated -->', '"updated"')
+    second = crawler.fetch(url, first.etag)
+    assert second.status == 200
+    assert second.etag == '"updated"'
+    assert site.not_modified == 0
+
+
+def test_server_errors_are_retried(site):
+    site.fail(SERIES_PATH, 503, 502)
+    result = Crawler(retries=3, backoff=0, delay=0).fetch(site.base_url + SERIES_PATH)
+    assert result.status == 200
+    assert site.hits == 3
+
+
+def test_gives_up_once_retries_run_out(site):
+    site.fail(SERIES_PATH, 503, 503, 503)
+    with pytest.raises(requests.RequestException):
+        Crawler(retries=2, backoff=0, delay=0).fetch(site.base_url + SERIES_PATH)
+    assert site.hits == 3
+
+
+def test_client_errors_are_not_retried(site):
+    site.fail(SERIES_PATH, 404)
+    with pytest.raises(requests.HTTPError) as excinfo:
+        Crawler(retries=3, backoff=0, delay=0).fetch(site.base_url + SERIES_PATH)
+    assert excinfo.value.response.status_code == 404
+    assert site.hits == 1
+
+
+def test_fetch_many_yields_every_url(site):
+    paths = [path for path in site.pages if '/20' in path][:5] + ['/culture/missing-on-my-radar']
+    urls = [site.base_url + path for path in paths]
+
+    results = dict(Crawler(retries=0, delay=0).fetch_many(urls))
+    assert set(results) == set(urls)
+    assert all(isinstance(results[url], FetchResult) and results[url].status == 200 for url in urls[:-1])
+    assert isinstance(results[urls[-1]], requests.HTTPError)
@@ -0,0 +1,79 @@
+from time import perf_counter
+
+import pytest
+
+import llm
+from llm import StubChatClient, fake_reply
+from llm_cache import ResponseCache
+
+RESULTS = [
+    {
+        'title': f"On my radar: Person {number}'s cultural highlights",
+        'snippet': f'Snippet {number} about an album.',
+        'image': None,
+        'link': f'https://example.com/on-my-radar-{number}',
+        'recommended_by': None,
+        'recommender_info': None,
+        'external_links': {f'Album {number}': f'https://example.com/album-{number}'},
+    }
+    for number in range(5)
+]
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """The app module with an empty LLM cache."""
+    import app
+
+    monkeypatch.setattr(app, 'llm_cache', ResponseCache(str(tmp_path / 'llm_cache.db')))
+    return app
+
+
+@pytest.fixture
+def use_client(monkeypatch):
+    def use(client):
+        monkeypatch.setattr(llm, '_client', client)
+        return client
+    return use
+
+
+def test_results_are_formatted_through_the_client(app, use_client):
+    client = use_client(StubChatClient(fake_reply))
+
+    formatted = app.format_results_with_ai(RESULTS, 'music')
+    assert [result['title'] for result in formatted] == [f'Album {number}' for number in range(5)]
+    assert [result['recommendation_link'] for result in formatted] == [
+        f'https://example.com/album-{number}' for number in range(5)]
+    calls = len(client.calls)
+    assert calls == len(app.plan_batches(RESULTS, 'music'))
+
+    # Formatted once, then served from the cache
+    assert app.format_results_with_ai(RESULTS, 'music') == formatted
+    assert len(client.calls) == calls
+
+
+def test_failed_batches_fall_back_to_one_request_per_article(app, use_client):
+    def responder(messages):
+        if 'JSON array' in messages[-1]['content']:
+            return 'not JSON'
+        return fake_reply(messages)
+
+    client = use_client(StubChatClient(responder))
+    formatted = app.format_results_with_ai(RESULTS, 'music')
+    assert [result['title'] for result in formatted] == [f'Album {number}' for number in range(5)]
+    assert len(client.calls) == len(app.plan_batches(RESULTS, 'music')) + len(RESULTS)
+
+
+def test_stub_latency_grows_with_the_articles_in_the_prompt():
+    client = StubChatClient(lambda messages: '', latency=0.01, latency_per_article=0.05)
+    batch = 'Respond with a JSON array\n' + ''.join(f'\n    Article {number}:\n    Title: {number}'
+                                                    for number in range(1, 4))
+    assert len(llm.prompt_articles(batch)) == 3
+
+    start = perf_counter()
+    client.complete([{'role': 'user', 'content': 'Analyze this cultural recommendation'}])
+    single = perf_counter() - start
+    start = perf_counter()
+    client.complete([{'role': 'user', 'content': batch}])
+    assert single >= 0.06
+    assert perf_counter() - start >= 0.16
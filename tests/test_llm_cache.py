@@ -0,0 +1,110 @@
+import threading
+from time import sleep
+
+import pytest
+
+import llm_cache
+from llm_cache import TOUCH_INTERVAL, ResponseCache, cache_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable replacement for the cache's clock; advance by adding to ``clock[0]``."""
+    now = [1_000_000.0]
+    monkeypatch.setattr(llm_cache, 'time', lambda: now[0])
+    return now
+
+
+def test_cache_key_depends_on_every_part():
+    assert cache_key(1, 'model', 'music', {'a': 1}) == cache_key(1, 'model', 'music', {'a': 1})
+    assert cache_key(1, 'model', 'music') != cache_key(2, 'model', 'music')
+    assert cache_key(1, 'model', 'music') != cache_key(1, 'model', 'books')
+
+
+def test_none_answers_are_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.db'))
+    cache.put('nothing relevant', None)
+    assert cache.get('nothing relevant') == (True, None)
+    assert cache.get('never stored') == (False, None)
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / 'cache.db'), ttl=60)
+    cache.put('key', {'title': 'Album'})
+
+    clock[0] += 59
+    assert cache.get('key') == (True, {'title': 'Album'})
+    clock[0] += 2
+    assert cache.get('key') == (False, None)
+    assert cache.get_many(['key']) == {}
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / 'cache.db'), max_entries=2)
+    cache.put('a', 1)
+    clock[0] += 1
+    cache.put('b', 2)
+
+    # Reading refreshes an entry once it's older than TOUCH_INTERVAL
+    clock[0] += TOUCH_INTERVAL + 1
+    assert cache.get('a') == (True, 1)
+    clock[0] += 1
+    cache.put('c', 3)
+
+    assert cache.get_many(['a', 'b', 'c']) == {'a': 1, 'c': 3}
+
+
+def test_get_or_compute_coalesces_concurrent_misses(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.db'))
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return {'title': 'Album'}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute('key', compute)))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    sleep(0.2)
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{'title': 'Album'}] * 8
+    stats = cache.stats()
+    assert stats['misses'] == 1
+    assert stats['hits'] + stats['coalesced'] == 7
+    # Later callers hit the stored value
+    assert cache.get_or_compute('key', compute) == {'title': 'Album'}
+    assert len(calls) == 1
+
+
+def test_failed_computations_are_not_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.db'))
+
+    def compute():
+        raise ValueError('bad response')
+
+    with pytest.raises(ValueError):
+        cache.get_or_compute('key', compute)
+    assert cache.get('key') == (False, None)
+    assert cache.get_or_compute('key', lambda: 'second try') == 'second try'
+
+
+def test_compute_many_stores_every_value_once(tmp_path):
+    cache = ResponseCache(str(tmp_path / 'cache.db'))
+    calls = []
+
+    def compute(keys):
+        calls.append(keys)
+        return [key.upper() for key in keys]
+
+    assert cache.compute_many(['a', 'b'], compute) == {'a': 'A', 'b': 'B'}
+    assert cache.compute_many(['a', 'b'], compute) == {'a': 'A', 'b': 'B'}
+    assert calls == [('a', 'b')]
+    assert cache.get_many(['a', 'b']) == {'a': 'A', 'b': 'B'}
@@ -0,0 +1,94 @@
+import json
+
+import pytest
+
+from article_store import ArticleStore
+from crawler import Crawler
+
+SERIES_PATH = '/culture/series/on-my-radar'
+# Articles listed on the three recorded series pages
+ARTICLE_COUNT = 24
+
+
+@pytest.fixture
+def app(site, tmp_path, monkeypatch):
+    """The app module crawling ``site`` into an empty article store."""
+    import app
+
+    monkeypatch.setattr(app, 'BASE_URL', site.base_url)
+    monkeypatch.setattr(app, 'SERIES_URL', site.base_url + SERIES_PATH)
+    monkeypatch.setattr(app, 'article_store', ArticleStore(str(tmp_path / 'articles.db')))
+    monkeypatch.setattr(app, 'crawler', Crawler(retries=0, delay=0))
+    return app
+
+
+def publish(site, path, like):
+    """Add a new article at the top of the first series page, with the body of ``like``."""
+    body, _ = site.pages[SERIES_PATH]
+    body = body.replace(b'<ul class="fc-slice">', f'<ul class="fc-slice"><li><a href="{path}">New</a></li>'.encode(), 1)
+    site.pages[SERIES_PATH] = (body, f'"{path}"')
+    if like:
+        site.pages[path] = site.pages[like]
+
+
+def first_article(app, site):
+    return app.parse_article_urls(site.pages[SERIES_PATH][0].decode())[0]
+
+
+def test_walk_resumes_from_the_checkpoint(app, site):
+    assert app.refresh_articles(force=True, max_pages=1, polite=False) == 10
+    state = app.article_store.crawl_state()
+    assert state['next_page'] == '2'
+    assert state['pending_mark'] == first_article(app, site)
+    assert 'high_water_mark' not in state
+
+    assert app.refresh_articles(max_pages=1, polite=False) == 10
+    assert app.article_store.crawl_state()['next_page'] == '3'
+
+    assert app.refresh_articles(polite=False) == ARTICLE_COUNT - 20
+    assert app.article_store.count() == ARTICLE_COUNT
+    assert app.article_store.crawl_state() == {'high_water_mark': first_article(app, site)}
+
+
+def test_poll_only_reads_the_first_page(app, site):
+    app.refresh_articles(polite=False)
+    hits = site.hits
+
+    assert app.refresh_articles(polite=False) == 0
+    assert site.hits - hits == 1
+    assert site.not_modified == 1
+
+
+def test_walk_stops_at_the_high_water_mark(app, site):
+    app.refresh_articles(polite=False)
+    new_path = '/culture/2025/jan/05/new-person-on-my-radar-cultural-highlights'
+    publish(site, new_path, like=next(path for path in site.pages if '/20' in path))
+    hits = site.hits
+
+    assert app.refresh_articles(polite=False) == 1
+    # The first series page and the new article, not the rest of the archive
+    assert site.hits - hits == 2
+    assert app.article_store.count() == ARTICLE_COUNT + 1
+    assert app.article_store.crawl_state() == {'high_water_mark': site.base_url + new_path}
+
+
+def test_failed_articles_are_retried_without_walking_again(app, site):
+    app.refresh_articles(polite=False)
+    flaky = '/culture/2025/jan/06/flaky-on-my-radar-cultural-highlights'
+    publish(site, flaky, like=next(path for path in site.pages if '/20' in path))
+    site.fail(flaky, 503)
+
+    assert app.refresh_articles(polite=False) == 0
+    assert json.loads(app.article_store.crawl_state()['failed']) == {site.base_url + flaky: 1}
+
+    assert app.refresh_articles(polite=False) == 1
+    assert 'failed' not in app.article_store.crawl_state()
+    assert site.not_modified == 1
+
+
+def test_missing_articles_are_not_retried(app, site):
+    app.refresh_articles(polite=False)
+    publish(site, '/culture/2025/jan/07/gone-on-my-radar-cultural-highlights', like=None)
+
+    assert app.refresh_articles(polite=False) == 0
+    assert 'failed' not in app.article_store.crawl_state()
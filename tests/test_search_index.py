@@ -0,0 +1,66 @@
+from search_index import SearchIndex
+
+ARTICLES = {
+    'a': ('Radio days', ['A podcast about old radio plays.', 'Also a novel set in a radio station.']),
+    'b': ('Books and music', ['A new novel by a debut author.', 'An album of string quartets.']),
+    'c': ('On the road', ['A podcast and a film about touring bands.']),
+}
+
+QUERIES = ['podcast', 'novel', 'radio', 'album', 'film band', 'quartet', 'missing']
+
+
+def build(articles):
+    index = SearchIndex()
+    for url, (title, paragraphs) in articles.items():
+        index.add_article(url, title, paragraphs)
+    return index
+
+
+def state(index):
+    # Everything the scores are computed from
+    return (index._postings, dict(+index._paragraph_frequency), index._articles,
+            index._paragraph_count, index._total_length)
+
+
+def test_search_finds_articles_with_every_term():
+    index = build(ARTICLES)
+    assert {url for url, _, _ in index.search('podcast')} == {'a', 'c'}
+    assert [url for url, _, _ in index.search('podcast radio')] == ['a']
+    assert index.search('missing') == []
+
+
+def test_matching_paragraphs_are_returned():
+    index = build(ARTICLES)
+    [(url, _, paragraphs)] = index.search('quartets')
+    assert url == 'b'
+    assert paragraphs == ['An album of string quartets.']
+
+
+def test_remove_article_drops_it_from_results():
+    index = build(ARTICLES)
+    index.remove_article('a')
+    assert 'a' not in index
+    assert {url for url, _, _ in index.search('podcast')} == {'c'}
+    assert index.search('radio') == []
+
+
+def test_removing_everything_leaves_an_empty_index():
+    index = build(ARTICLES)
+    for url in ARTICLES:
+        index.remove_article(url)
+    assert len(index) == 0
+    assert state(index) == ({}, {}, {}, 0, 0)
+
+
+def test_updates_leave_the_same_index_as_building_from_scratch():
+    changed = ('Books and film', ['A documentary about a novel.', 'No music this time.'])
+    index = build(ARTICLES)
+    # Re-adding replaces the old version of the article
+    index.add_article('b', *changed)
+    index.remove_article('a')
+    index.remove_article('not indexed')
+
+    expected = build({'b': changed, 'c': ARTICLES['c']})
+    assert state(index) == state(expected)
+    for query in QUERIES:
+        assert index.search(query) == expected.search(query)
@@ -0,0 +1,2 @@
+"""WSGI entry point for production: ``gunicorn wsgi:app`` (settings in gunicorn.conf.py)."""
+from app import app